@@ -1,5 +1,6 @@
 import flet as ft
-import requests
+import httpx
+import cliente_http
 from typing import Dict, Optional
 import logging
 from functools import partial
@@ -20,6 +21,21 @@ class AppConfig:
     SERVER_HOST = "0.0.0.0"
     SERVER_PORT = 8500
     ASSETS_DIR = "assets"
+    POOL_MAX_CONEXOES = 20  # Conexões simultâneas com a API por processo
+    POOL_MAX_KEEPALIVE = 10  # Conexões ociosas mantidas abertas para reuso
+    POOL_KEEPALIVE_EXPIRY = 30.0  # Segundos até fechar uma conexão ociosa
+    TIMEOUT_CONEXAO = 5.0
+    TIMEOUT_LEITURA = 10.0
+
+# Pool HTTP único do processo, compartilhado por todas as sessões
+cliente_http.configurar(
+    AppConfig.API_BASE,
+    max_conexoes=AppConfig.POOL_MAX_CONEXOES,
+    max_keepalive=AppConfig.POOL_MAX_KEEPALIVE,
+    keepalive_expiry=AppConfig.POOL_KEEPALIVE_EXPIRY,
+    timeout_conexao=AppConfig.TIMEOUT_CONEXAO,
+    timeout_leitura=AppConfig.TIMEOUT_LEITURA,
+)
 
 class ResponsiveCard(ft.Container):
     """Componente de card responsivo com tratamento robusto de erros"""
@@ -134,16 +150,13 @@ class SugestaoRolosView:
 
             self._update_ui("🔍 Buscando dados...", False)
             
-            response = requests.get(
-                f"{AppConfig.API_BASE}/sugestao-rolos/{pedido}",
-                timeout=10
-            )
+            response = cliente_http.obter_pool().get(f"/sugestao-rolos/{pedido}")
             response.raise_for_status()
 
             dados = response.json() or []
             self._exibir_resultados(dados)
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             self._update_ui(f"⚠️ Erro na conexão: {str(e)}", False)
         except Exception as e:
             self._update_ui(f"❌ Erro inesperado: {str(e)}", False)
@@ -0,0 +1,482 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ACEITE_STREAMING = "application/x-ndjson, application/json;q=0.9"
+
+
+class EntradaCache(NamedTuple):
+    dados: Any
+    etag: Optional[str]
+    tamanho: int
+    expira_em: float
+
+
+class LeitorJsonIncremental:
+    """Decodifica itens de um corpo JSON conforme os pedaços chegam.
+
+    Entende NDJSON (um item por linha) e arrays JSON no topo do documento.
+    Para qualquer outro formato só acumula o texto, e ``finalizar`` faz a
+    decodificação completa.
+    """
+
+    def __init__(self, ndjson: bool = False):
+        self._modo = "ndjson" if ndjson else None
+        self._buffer = ""
+        self._fim_array = False
+        self._decoder = json.JSONDecoder()
+        self.itens: List[Any] = []
+
+    def alimentar(self, texto: str) -> List[Any]:
+        """Acrescenta um pedaço do corpo e retorna os itens completados por ele"""
+        self._buffer += texto
+        if self._modo is None:
+            inicio = self._buffer.lstrip()
+            if not inicio:
+                return []
+            if inicio[0] == "[":
+                self._modo = "array"
+                self._buffer = inicio[1:]
+            else:
+                self._modo = "documento"
+        if self._modo == "ndjson":
+            return self._ler_linhas()
+        if self._modo == "array":
+            return self._ler_array()
+        return []
+
+    def _ler_linhas(self) -> List[Any]:
+        *linhas, self._buffer = self._buffer.split("\n")
+        novos = [json.loads(linha) for linha in linhas if linha.strip()]
+        self.itens.extend(novos)
+        return novos
+
+    def _ler_array(self) -> List[Any]:
+        novos = []
+        buffer, pos = self._buffer, 0
+        while not self._fim_array:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._fim_array = True
+                pos += 1
+                break
+            try:
+                item, fim = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Item ainda incompleto
+            if isinstance(item, (int, float)) and not self._delimitado(buffer, fim):
+                break  # "6." ou "1e-" no fim do pedaço decodificam como 6 e 1; espera o resto
+            novos.append(item)
+            pos = fim
+        self._buffer = buffer[pos:]
+        self.itens.extend(novos)
+        return novos
+
+    @staticmethod
+    def _delimitado(buffer: str, pos: int) -> bool:
+        """Indica se o próximo caractere depois dos espaços fecha o item ("," ou "]")"""
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        return pos < len(buffer) and buffer[pos] in ",]"
+
+    def finalizar(self) -> Any:
+        """Retorna o documento completo depois do último pedaço"""
+        if self._modo == "ndjson":
+            self._buffer += "\n"
+            self._ler_linhas()
+            return self.itens
+        if self._modo == "array":
+            self._ler_array()
+            if not self._fim_array:
+                raise ValueError("Array JSON incompleto na resposta")
+            return self.itens
+        return json.loads(self._buffer) if self._buffer.strip() else None
+
+
+class CacheRespostas:
+    """Cache LRU em memória das respostas JSON da API.
+
+    As entradas valem por ``ttl`` segundos. Vencidas, são revalidadas com
+    ``If-None-Match`` quando a API enviou ``ETag``, e um 304 renova a entrada
+    sem baixar o corpo de novo. O cache respeita tanto ``max_entradas`` quanto
+    ``max_bytes`` (tamanho do corpo recebido), descartando as menos usadas.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entradas: int = 200, max_bytes: int = 8 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas: "OrderedDict[str, EntradaCache]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._revalidadas = 0
+
+    def consultar(self, chave: str) -> Optional[EntradaCache]:
+        """Retorna a entrada (mesmo vencida) e a marca como usada"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+            return entrada
+
+    def guardar(self, chave: str, dados: Any, etag: Optional[str], tamanho: int):
+        """Guarda a resposta e descarta as entradas menos usadas além dos limites"""
+        with self._lock:
+            antiga = self._entradas.pop(chave, None)
+            if antiga is not None:
+                self._bytes -= antiga.tamanho
+            if tamanho > self.max_bytes:
+                return
+            self._entradas[chave] = EntradaCache(dados, etag, tamanho, time.monotonic() + self.ttl)
+            self._bytes += tamanho
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, descartada = self._entradas.popitem(last=False)
+                self._bytes -= descartada.tamanho
+
+    def renovar(self, chave: str, entrada: EntradaCache):
+        """Estende a validade de uma entrada revalidada com 304"""
+        with self._lock:
+            if self._entradas.get(chave) is entrada:
+                self._entradas[chave] = entrada._replace(expira_em=time.monotonic() + self.ttl)
+
+    def registrar(self, chave: str, resultado: str):
+        """Conta acerto, falha ou revalidação e registra no log"""
+        with self._lock:
+            if resultado == "acerto":
+                self._acertos += 1
+            elif resultado == "revalidada":
+                self._revalidadas += 1
+            else:
+                self._falhas += 1
+            resumo = (
+                f"acertos={self._acertos} revalidadas={self._revalidadas} "
+                f"falhas={self._falhas} entradas={len(self._entradas)} bytes={self._bytes}"
+            )
+        logger.info(f"Cache {resultado} para {chave} ({resumo})")
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "acertos": self._acertos,
+                "revalidadas": self._revalidadas,
+                "falhas": self._falhas,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+            }
+
+
+class PoolHttp:
+    """Cliente HTTP compartilhado pelo processo, com pool de conexões keep-alive.
+
+    Todas as sessões Flet reutilizam as mesmas conexões com a API. Há um
+    ``httpx.AsyncClient`` por event loop (no servidor web todas as sessões
+    rodam no mesmo loop) e um ``httpx.Client`` para código síncrono.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_conexoes: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout_conexao: float = 5.0,
+        timeout_leitura: float = 10.0,
+        cache: Optional[CacheRespostas] = None,
+    ):
+        self.base_url = base_url
+        self.cache = cache
+        self.max_conexoes = max_conexoes
+        self._limites = httpx.Limits(
+            max_connections=max_conexoes,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(
+            timeout_leitura, connect=timeout_conexao, pool=timeout_conexao
+        )
+        self._clientes_async = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+        self._cliente_sync: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+        self._abertas = 0
+        self._reutilizadas = 0
+        self._requisicoes = 0
+        self._em_andamento = 0
+        self._pico_em_andamento = 0
+        self._coalescidas = 0
+        self._abandonadas = 0
+        self._em_voo = weakref.WeakKeyDictionary()  # event loop -> {caminho: [Task, interessados]}
+
+    def cliente_async(self) -> httpx.AsyncClient:
+        """Retorna o cliente assíncrono do event loop corrente"""
+        loop = asyncio.get_running_loop()
+        cliente = self._clientes_async.get(loop)
+        if cliente is None or cliente.is_closed:
+            cliente = httpx.AsyncClient(
+                base_url=self.base_url, limits=self._limites, timeout=self._timeout
+            )
+            self._clientes_async[loop] = cliente
+        return cliente
+
+    def cliente_sync(self) -> httpx.Client:
+        """Retorna o cliente síncrono compartilhado"""
+        with self._lock:
+            if self._cliente_sync is None or self._cliente_sync.is_closed:
+                self._cliente_sync = httpx.Client(
+                    base_url=self.base_url, limits=self._limites, timeout=self._timeout
+                )
+            return self._cliente_sync
+
+    def _iniciar(self) -> dict:
+        with self._lock:
+            self._requisicoes += 1
+            self._em_andamento += 1
+            self._pico_em_andamento = max(self._pico_em_andamento, self._em_andamento)
+        return {"abriu": False}
+
+    def _registrar_evento(self, estado: dict, evento: str):
+        if evento == "connection.connect_tcp.complete":
+            estado["abriu"] = True
+            with self._lock:
+                self._abertas += 1
+
+    def _finalizar(self, estado: dict, sucesso: bool):
+        with self._lock:
+            self._em_andamento -= 1
+            if sucesso and not estado["abriu"]:
+                self._reutilizadas += 1
+
+    async def get_async(self, caminho: str, **kwargs) -> httpx.Response:
+        """GET assíncrono pelo pool compartilhado"""
+        estado = self._iniciar()
+
+        async def rastrear(evento: str, info: dict):
+            self._registrar_evento(estado, evento)
+
+        sucesso = False
+        try:
+            response = await self.cliente_async().get(
+                caminho, extensions={"trace": rastrear}, **kwargs
+            )
+            sucesso = True
+            return response
+        finally:
+            self._finalizar(estado, sucesso)
+
+    async def get_json_async(
+        self,
+        caminho: str,
+        ao_atualizar: Optional[Callable[[Any], None]] = None,
+        ao_receber_lote: Optional[Callable[[list], None]] = None,
+    ) -> Any:
+        """GET assíncrono que devolve o JSON, passando pelo cache quando houver.
+
+        Consultas simultâneas ao mesmo caminho compartilham uma única
+        requisição (single-flight). ``ao_atualizar`` e ``ao_receber_lote`` são
+        usados só por quem iniciou a requisição: o primeiro quando a API
+        devolve dados novos, o segundo a cada lote de itens lido do corpo
+        ainda em download.
+
+        A requisição compartilhada só é cancelada quando todos os interessados
+        desistem (busca trocada, sessão encerrada).
+        """
+        loop = asyncio.get_running_loop()
+        em_voo = self._em_voo.setdefault(loop, {})
+        voo = em_voo.get(caminho)
+        if voo is None:
+            tarefa = loop.create_task(
+                self._buscar_json_async(caminho, ao_atualizar, ao_receber_lote)
+            )
+            voo = em_voo[caminho] = [tarefa, 0]
+            tarefa.add_done_callback(partial(self._liberar_voo, em_voo, caminho))
+        else:
+            with self._lock:
+                self._coalescidas += 1
+        tarefa = voo[0]
+        voo[1] += 1
+        try:
+            # Cancelar uma sessão não pode cancelar a requisição das demais
+            return await asyncio.shield(tarefa)
+        except asyncio.CancelledError:
+            if voo[1] == 1 and not tarefa.done():
+                tarefa.cancel()
+                with self._lock:
+                    self._abandonadas += 1
+            raise
+        finally:
+            voo[1] -= 1
+
+    @staticmethod
+    def _liberar_voo(em_voo: dict, caminho: str, tarefa: asyncio.Task):
+        voo = em_voo.get(caminho)
+        if voo is not None and voo[0] is tarefa:
+            del em_voo[caminho]
+        if not tarefa.cancelled():
+            tarefa.exception()  # Evita aviso quando todos os interessados desistiram
+
+    async def _buscar_json_async(
+        self,
+        caminho: str,
+        ao_atualizar: Optional[Callable[[Any], None]],
+        ao_receber_lote: Optional[Callable[[list], None]],
+    ) -> Any:
+        entrada = self.cache.consultar(caminho) if self.cache is not None else None
+        if entrada is not None and entrada.expira_em > time.monotonic():
+            self.cache.registrar(caminho, "acerto")
+            return entrada.dados
+
+        headers = {"If-None-Match": entrada.etag} if entrada is not None and entrada.etag else {}
+        response, dados, tamanho = await self._baixar_json_async(caminho, headers, ao_receber_lote)
+        if response.status_code == 304:
+            if entrada is None:
+                response.raise_for_status()
+            self.cache.renovar(caminho, entrada)
+            self.cache.registrar(caminho, "revalidada")
+            return entrada.dados
+
+        if self.cache is not None:
+            self.cache.guardar(caminho, dados, response.headers.get("ETag"), tamanho)
+            self.cache.registrar(caminho, "falha")
+        self._notificar(ao_atualizar, dados)
+        return dados
+
+    async def _baixar_json_async(
+        self, caminho: str, headers: dict, ao_receber_lote: Optional[Callable[[list], None]]
+    ) -> Tuple[httpx.Response, Any, int]:
+        """Baixa e decodifica o JSON; retorna (response, dados, bytes do corpo).
+
+        Com ``ao_receber_lote`` o corpo é lido em streaming e os itens são
+        entregues em lotes conforme chegam (NDJSON ou array JSON). Qualquer
+        outro formato é decodificado inteiro no fim.
+        """
+        if ao_receber_lote is None:
+            response = await self.get_async(caminho, headers=headers)
+            if response.status_code == 304:
+                return response, None, 0
+            response.raise_for_status()
+            return response, response.json(), len(response.content)
+
+        estado = self._iniciar()
+
+        async def rastrear(evento: str, info: dict):
+            self._registrar_evento(estado, evento)
+
+        sucesso = False
+        try:
+            async with self.cliente_async().stream(
+                "GET",
+                caminho,
+                headers={**headers, "Accept": ACEITE_STREAMING},
+                extensions={"trace": rastrear},
+            ) as response:
+                sucesso = True
+                if response.status_code == 304:
+                    return response, None, 0
+                response.raise_for_status()
+                tipo = response.headers.get("Content-Type", "")
+                leitor = LeitorJsonIncremental(ndjson="ndjson" in tipo or "jsonl" in tipo)
+                async for texto in response.aiter_text():
+                    itens = leitor.alimentar(texto)
+                    if itens:
+                        ao_receber_lote(itens)
+                return response, leitor.finalizar(), response.num_bytes_downloaded
+        finally:
+            self._finalizar(estado, sucesso)
+
+    @staticmethod
+    def _notificar(ao_atualizar: Optional[Callable[[Any], None]], dados: Any):
+        if ao_atualizar is None:
+            return
+        try:
+            ao_atualizar(dados)
+        except Exception as e:
+            logger.error(f"Erro ao notificar atualização: {str(e)}")
+
+    def get(self, caminho: str, **kwargs) -> httpx.Response:
+        """GET síncrono pelo pool compartilhado"""
+        estado = self._iniciar()
+
+        def rastrear(evento: str, info: dict):
+            self._registrar_evento(estado, evento)
+
+        sucesso = False
+        try:
+            response = self.cliente_sync().get(
+                caminho, extensions={"trace": rastrear}, **kwargs
+            )
+            sucesso = True
+            return response
+        finally:
+            self._finalizar(estado, sucesso)
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores do pool para dimensionamento.
+
+        ``aguardando`` é o número de requisições em andamento além do limite
+        de conexões, isto é, as que estão na fila do pool.
+        """
+        with self._lock:
+            return {
+                "requisicoes": self._requisicoes,
+                "conexoes_abertas": self._abertas,
+                "conexoes_reutilizadas": self._reutilizadas,
+                "em_andamento": self._em_andamento,
+                "aguardando": max(0, self._em_andamento - self.max_conexoes),
+                "pico_em_andamento": self._pico_em_andamento,
+                "coalescidas": self._coalescidas,
+                "abandonadas": self._abandonadas,
+            }
+
+    def fechar(self):
+        """Fecha o cliente síncrono e registra as estatísticas finais"""
+        with self._lock:
+            if self._cliente_sync is not None:
+                self._cliente_sync.close()
+                self._cliente_sync = None
+        logger.info(f"Pool HTTP encerrado: {self.estatisticas()}")
+
+    async def fechar_async(self):
+        """Fecha o cliente assíncrono do event loop corrente"""
+        cliente = self._clientes_async.pop(asyncio.get_running_loop(), None)
+        if cliente is not None:
+            await cliente.aclose()
+
+
+_pool: Optional[PoolHttp] = None
+_pool_lock = threading.Lock()
+
+
+def configurar(base_url: str, **opcoes) -> PoolHttp:
+    """Cria o pool do processo; chamadas seguintes retornam o pool existente"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolHttp(base_url, **opcoes)
+            atexit.register(_pool.fechar)
+        elif _pool.base_url != base_url:
+            logger.warning(
+                f"Pool HTTP já configurado para {_pool.base_url}; ignorando {base_url}"
+            )
+        return _pool
+
+
+def obter_pool() -> PoolHttp:
+    """Retorna o pool do processo, que precisa ter sido configurado"""
+    if _pool is None:
+        raise RuntimeError("Pool HTTP não configurado; chame configurar() antes")
+    return _pool
@@ -1,6 +1,1119 @@
 import flet as ft
 from flet import Icons
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import deque
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+SQL_PATH = "atualizar_CTE_peca.sql"
+TAMANHO_BLOCO_CSV = 4 * 1024 * 1024  # Bytes do CSV lidos por bloco (~90 mil linhas)
+TAMANHO_BLOCO_MAXIMO = 1024 * 1024 * 1024  # O leitor do pyarrow aceita no máximo int32 por bloco
+TAMANHO_FAIXA_BYTES = 16 * 1024 * 1024  # Bytes do CSV por tarefa no modo paralelo
+MANIFESTO_PATH = "manifesto_CTE_peca.sqlite"  # Últimos valores emitidos, para o modo incremental
+RELATORIO_CONFLITOS_PATH = "conflitos_CTE_peca.csv"  # Chaves repetidas com valores diferentes
+REJEITADOS_PATH = "rejeitados_CTE_peca.csv"  # Linhas do CSV que não passaram na validação
+SUFIXO_PARCIAL = ".parcial"  # Saída em gravação; renomeada só quando a geração termina com sucesso
+
+# Esquema do CSV exportado pelos teares: coluna -> largura com zeros à esquerda.
+# Colunas com largura são códigos numéricos; as demais são texto obrigatório.
+ESQUEMA_CSV = {
+    'NRO_ROLO': 10,
+    'NRO_PECA': 3,
+    'LOTE': None,
+    'AVISO': 6,
+    'TEAR': 6,
+    'Num_Etq_Aux': None,
+}
+
+COLUNAS_CHAVE = ['NRO_ROLO', 'NRO_PECA', 'LOTE', 'AVISO']
+COLUNAS_VALOR = ['TEAR', 'Num_Etq_Aux']
+TAMANHO_PREVIA = 3000  # Caracteres exibidos na prévia de saídas compactadas
+TAMANHO_PAGINA = 50  # Comandos por página na prévia paginada
+TAMANHO_PAGINA_BYTES = 256 * 1024  # Limite por página: um INSERT de staging tem até 1000 linhas
+TAMANHO_LOTE_INSERT = 1000  # Limite do SQL Server para linhas em um INSERT ... VALUES
+
+# Formatos de saída
+FORMATO_POR_LINHA = "por_linha"  # Um UPDATE por linha do CSV
+FORMATO_STAGING = "staging"  # INSERTs em tabela temporária + um único UPDATE com JOIN
+FORMATO_DIRETO = "direto"  # Aplica direto no banco com executemany, sem gerar arquivo
+
+TAMANHO_LOTE_EXECUTEMANY = 5000  # Linhas por chamada de executemany
+INTERVALO_COMMIT = 50_000  # Linhas aplicadas entre commits
+
+SQL_UPDATE_PARAMETRIZADO = """UPDATE CTE_peca
+SET Tear = ?, Num_Etq_Aux = ?
+WHERE Nro_rolo = ? AND Nro_peca = ? AND Sublote = ? AND Aviso = ?"""
+
+STAGING_TABLE = "#CTE_peca_stage"
+
+STAGING_CABECALHO = f"""SET NOCOUNT ON;
+
+CREATE TABLE {STAGING_TABLE} (
+    Seq BIGINT NOT NULL,
+    Nro_rolo VARCHAR(10) COLLATE DATABASE_DEFAULT NOT NULL,
+    Nro_peca VARCHAR(3) COLLATE DATABASE_DEFAULT NOT NULL,
+    Sublote VARCHAR(MAX) COLLATE DATABASE_DEFAULT NOT NULL,
+    Aviso VARCHAR(6) COLLATE DATABASE_DEFAULT NOT NULL,
+    Tear VARCHAR(6) COLLATE DATABASE_DEFAULT NOT NULL,
+    Num_Etq_Aux VARCHAR(MAX) COLLATE DATABASE_DEFAULT NULL
+);
+"""
+
+# Sublote é VARCHAR(MAX) para não truncar valores longos e por isso não entra na
+# chave do índice; rolo + peça + aviso já deixam poucas linhas por busca no JOIN.
+# Seq segue a ordem do CSV: com chaves repetidas vale a última ocorrência,
+# como no formato de um UPDATE por linha.
+STAGING_RODAPE = f"""CREATE CLUSTERED INDEX IX_CTE_peca_stage ON {STAGING_TABLE} (Nro_rolo, Nro_peca, Aviso);
+
+BEGIN TRANSACTION;
+
+UPDATE p
+SET p.Tear = s.Tear, p.Num_Etq_Aux = s.Num_Etq_Aux
+FROM CTE_peca p
+INNER JOIN (
+    SELECT Nro_rolo, Nro_peca, Sublote, Aviso, Tear, Num_Etq_Aux,
+        ROW_NUMBER() OVER (PARTITION BY Nro_rolo, Nro_peca, Sublote, Aviso ORDER BY Seq DESC) AS Ordem
+    FROM {STAGING_TABLE}
+) s
+    ON p.Nro_rolo = s.Nro_rolo AND p.Nro_peca = s.Nro_peca AND p.Sublote = s.Sublote AND p.Aviso = s.Aviso
+    AND s.Ordem = 1;
+
+COMMIT TRANSACTION;
+
+DROP TABLE {STAGING_TABLE};
+"""
+
+# Cabeçalho e rodapé que envolvem o corpo de cada formato
+MOLDURAS = {
+    FORMATO_POR_LINHA: ("", ""),
+    FORMATO_STAGING: (STAGING_CABECALHO, STAGING_RODAPE),
+}
+
+def formatar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza as colunas do CSV como operações colunares (sem laço por linha)"""
+    if df.attrs.get('formatado'):
+        return df  # Já validado e preenchido por `ler_csv`
+    return pd.DataFrame({
+        'NRO_ROLO': df['NRO_ROLO'].astype(str).str.zfill(10),
+        'NRO_PECA': df['NRO_PECA'].astype(int).astype(str).str.zfill(3),
+        'LOTE': df['LOTE'].astype(str),
+        'AVISO': df['AVISO'].astype(str).str.zfill(6),
+        'TEAR': df['TEAR'].astype(str).str.zfill(6),
+        'Num_Etq_Aux': df['Num_Etq_Aux'].astype(str),
+    })
+
+def escapar_sql(valores: pd.Series) -> pd.Series:
+    """Duplica as aspas simples para uso dentro de um literal SQL"""
+    return valores.str.replace("'", "''", regex=False)
+
+def _opcoes_csv(rejeitar_linha=None) -> dict:
+    """Opções do leitor CSV do pyarrow segundo o `ESQUEMA_CSV` (tudo lido como texto)"""
+    return {
+        "parse_options": pa_csv.ParseOptions(delimiter=';', invalid_row_handler=rejeitar_linha),
+        "convert_options": pa_csv.ConvertOptions(
+            include_columns=list(ESQUEMA_CSV),
+            column_types={coluna: pa.string() for coluna in ESQUEMA_CSV},
+            strings_can_be_null=True,
+        ),
+    }
+
+def validar_tabela(tabela, indice=None) -> tuple:
+    """Valida e preenche as colunas do bloco numa única passada colunar.
+
+    Retorna `(validas, rejeitadas)`: o DataFrame já formatado (marcado em
+    `attrs['formatado']`) e um DataFrame LINHA_CSV/MOTIVO/CONTEUDO com as
+    linhas recusadas. `indice` é a posição de cada linha no CSV (linha - 2).
+    """
+    colunas, invalidas = {}, {}
+    for coluna, largura in ESQUEMA_CSV.items():
+        valores = tabela[coluna]
+        if largura:
+            valores = pc.utf8_trim_whitespace(valores)
+            ok = pc.match_substring_regex(valores, rf"^\d{{1,{largura}}}$")
+            colunas[coluna] = pc.utf8_lpad(valores, largura, padding="0")
+        else:
+            # Texto segue como veio; aspas simples são escapadas só ao gerar o SQL em texto
+            ok = pc.greater(pc.utf8_length(valores), 0)
+            colunas[coluna] = valores
+        invalidas[coluna] = pc.invert(pc.fill_null(ok, False)).to_numpy(zero_copy_only=False)
+
+    invalida = np.logical_or.reduce(list(invalidas.values()))
+    indice = np.arange(tabela.num_rows) if indice is None else np.asarray(indice)
+
+    validas = pa.table(colunas).filter(pa.array(~invalida)).to_pandas()
+    validas.index = indice[~invalida]
+    validas.attrs['formatado'] = True
+
+    rejeitadas = pd.DataFrame(columns=['LINHA_CSV', 'MOTIVO', 'CONTEUDO'])
+    if invalida.any():
+        originais = tabela.filter(pa.array(invalida)).to_pandas().fillna('')
+        motivo = np.select(
+            [invalidas[coluna][invalida] for coluna in ESQUEMA_CSV],
+            [f"{coluna} ausente ou inválido" for coluna in ESQUEMA_CSV],
+            default=""
+        )
+        rejeitadas = pd.DataFrame({
+            'LINHA_CSV': indice[invalida] + 2,
+            'MOTIVO': motivo,
+            'CONTEUDO': originais.astype(str).agg(';'.join, axis=1).to_numpy(),
+        })
+    return validas, rejeitadas
+
+def ler_csv(csv_path: str, rejeitados: list = None, tamanho_bloco: int = TAMANHO_BLOCO_CSV):
+    """Lê o CSV em blocos com o leitor do pyarrow, validando cada bloco.
+
+    Gera DataFrames já formatados. Linhas inválidas (inclusive com número
+    errado de colunas) não interrompem a leitura: vão para `rejeitados`, se
+    informado, como DataFrames LINHA_CSV/MOTIVO/CONTEUDO.
+    """
+    malformadas = []  # (linha, motivo, texto), em ordem crescente de linha
+
+    def rejeitar_linha(linha) -> str:
+        malformadas.append((linha.number, f"esperadas {linha.expected_columns} colunas, encontradas {linha.actual_columns}", linha.text))
+        return 'skip'
+
+    leitor = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=min(tamanho_bloco, TAMANHO_BLOCO_MAXIMO), use_threads=False),
+        **_opcoes_csv(rejeitar_linha)
+    )
+    proxima = 2  # Linha física do próximo registro (1 = cabeçalho)
+    puladas = 0  # Quantas malformadas já foram descontadas da numeração
+    for lote in leitor:
+        # O leitor pode estar adiantado, mas todas as malformadas até o fim deste lote já são conhecidas
+        fim = proxima + lote.num_rows
+        ignoradas = []
+        while puladas < len(malformadas) and malformadas[puladas][0] < fim:
+            ignoradas.append(malformadas[puladas][0])
+            puladas += 1
+            fim += 1
+        linhas = np.setdiff1d(np.arange(proxima, fim), ignoradas)
+        proxima = fim
+
+        validas, rejeitadas = validar_tabela(pa.Table.from_batches([lote]), linhas - 2)
+        if rejeitados is not None and len(rejeitadas):
+            rejeitados.append(rejeitadas)
+        yield validas
+
+    if rejeitados is not None and malformadas:
+        rejeitados.append(pd.DataFrame(malformadas, columns=['LINHA_CSV', 'MOTIVO', 'CONTEUDO']))
+
+def gravar_rejeitados(rejeitados: list, caminho: str = REJEITADOS_PATH) -> int:
+    """Grava as linhas recusadas na leitura; retorna quantas foram"""
+    if not rejeitados:
+        if os.path.exists(caminho):
+            os.remove(caminho)  # Não deixa arquivo de uma execução anterior
+        return 0
+    relatorio = pd.concat(rejeitados).sort_values('LINHA_CSV', kind='stable', na_position='last')
+    relatorio.to_csv(caminho, sep=';', index=False)
+    return len(relatorio)
+
+def gerar_updates(df: pd.DataFrame) -> pd.Series:
+    """Gera um UPDATE por linha concatenando colunas inteiras de uma vez"""
+    cols = formatar_colunas(df)
+    return (
+        "UPDATE CTE_peca\nSET Tear = '" + cols['TEAR']
+        + "', Num_Etq_Aux = '" + escapar_sql(cols['Num_Etq_Aux'])
+        + "'\nWHERE Nro_rolo = '" + cols['NRO_ROLO']
+        + "' AND Nro_peca = '" + cols['NRO_PECA']
+        + "' AND Sublote = '" + escapar_sql(cols['LOTE'])
+        + "' AND Aviso = '" + cols['AVISO'] + "';\n"
+    )
+
+def gerar_update_sql(df: pd.DataFrame) -> str:
+    """Gera o corpo do script com um UPDATE por linha"""
+    # Mesmo separador do formato original: uma linha em branco entre os UPDATEs
+    return "\n".join(gerar_updates(df).tolist())
+
+def gerar_valores_staging(df: pd.DataFrame) -> pd.Series:
+    """Monta a tupla VALUES de cada linha para a tabela de staging.
+
+    O índice de `df` (posição da linha no CSV) vira a coluna Seq.
+    """
+    cols = formatar_colunas(df)
+    return (
+        "(" + pd.Series(df.index, index=cols.index).astype(str)
+        + ", '" + cols['NRO_ROLO']
+        + "', '" + cols['NRO_PECA']
+        + "', '" + escapar_sql(cols['LOTE'])
+        + "', '" + cols['AVISO']
+        + "', '" + cols['TEAR']
+        + "', '" + escapar_sql(cols['Num_Etq_Aux']) + "')"
+    )
+
+def gerar_inserts_staging(df: pd.DataFrame, tamanho_lote: int = TAMANHO_LOTE_INSERT) -> list:
+    """Agrupa as linhas em INSERTs de múltiplas linhas com até `tamanho_lote` tuplas cada.
+
+    Retorna pares `(insert, linhas)`.
+    """
+    if not 1 <= tamanho_lote <= TAMANHO_LOTE_INSERT:
+        raise ValueError(f"Linhas por INSERT deve estar entre 1 e {TAMANHO_LOTE_INSERT}")
+
+    valores = gerar_valores_staging(df).tolist()
+    return [
+        (
+            f"INSERT INTO {STAGING_TABLE} (Seq, Nro_rolo, Nro_peca, Sublote, Aviso, Tear, Num_Etq_Aux) VALUES\n"
+            + ",\n".join(valores[i:i + tamanho_lote]) + ";\n",
+            len(valores[i:i + tamanho_lote])
+        )
+        for i in range(0, len(valores), tamanho_lote)
+    ]
+
+def gerar_insert_staging(df: pd.DataFrame, tamanho_lote: int = TAMANHO_LOTE_INSERT) -> str:
+    """Gera o corpo do script de staging com os INSERTs em lote"""
+    return "\n".join(insert for insert, _ in gerar_inserts_staging(df, tamanho_lote))
+
+def gerar_comandos(df: pd.DataFrame, formato: str = FORMATO_POR_LINHA,
+                   tamanho_lote: int = TAMANHO_LOTE_INSERT) -> list:
+    """Gera os comandos das linhas de `df` no formato escolhido, como pares `(texto, linhas)`"""
+    if formato == FORMATO_STAGING:
+        return gerar_inserts_staging(df, tamanho_lote)
+    return [(update, 1) for update in gerar_updates(df).tolist()]
+
+def gerar_corpo_sql(df: pd.DataFrame, formato: str = FORMATO_POR_LINHA,
+                    tamanho_lote: int = TAMANHO_LOTE_INSERT) -> str:
+    """Gera o trecho do script correspondente às linhas de `df` no formato escolhido"""
+    if formato == FORMATO_STAGING:
+        return gerar_insert_staging(df, tamanho_lote)
+    return gerar_update_sql(df)
+
+def gerar_sql(df: pd.DataFrame, formato: str = FORMATO_POR_LINHA,
+              tamanho_lote: int = TAMANHO_LOTE_INSERT) -> str:
+    """Gera o script completo (cabeçalho, corpo e rodapé) no formato escolhido"""
+    cabecalho, rodape = MOLDURAS[formato]
+    partes = [cabecalho, gerar_corpo_sql(df, formato, tamanho_lote), rodape]
+    return "\n".join(parte for parte in partes if parte)
+
+class _ArquivoComHash(io.RawIOBase):
+    """Arquivo binário que calcula o SHA-256 e conta os bytes enquanto grava"""
+
+    def __init__(self, caminho: str):
+        self.arquivo = open(caminho, "wb")
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self.arquivo.write(dados)
+        self.sha256.update(dados)
+        self.bytes += len(dados)
+        return len(dados)
+
+    def close(self):
+        if not self.closed:
+            self.arquivo.close()
+        super().close()
+
+class SaidaSql:
+    """Destino do script gerado: arquivo único ou shards, opcionalmente compactados com gzip.
+
+    Com `max_comandos` ou `max_bytes` o script é dividido em vários arquivos,
+    cada um autossuficiente e em sua própria transação, para que possam ser
+    executados em sessões paralelas. Um manifesto JSON lista os shards com
+    comandos, linhas e SHA-256.
+
+    Para arquivos sem compressão, `indices` guarda o deslocamento em bytes do
+    início de cada comando (mais o fim do último), usado pela prévia paginada.
+
+    Os arquivos são gravados com o sufixo `SUFIXO_PARCIAL` e só recebem o nome
+    final em `fechar`; se a geração falhar, `descartar` apaga os parciais e a
+    saída de uma execução anterior fica intacta.
+    """
+
+    def __init__(self, sql_path: str, formato: str = FORMATO_POR_LINHA, compactar: bool = False,
+                 max_comandos: int = None, max_bytes: int = None):
+        self.sql_path = sql_path
+        self.formato = formato
+        self.compactar = compactar
+        self.max_comandos = max_comandos
+        self.max_bytes = max_bytes
+        self.fragmentar = bool(max_comandos or max_bytes)
+        self.cabecalho, self.rodape = MOLDURAS[formato]
+        if self.fragmentar and formato == FORMATO_POR_LINHA:
+            self.cabecalho, self.rodape = "BEGIN TRANSACTION;\n", "COMMIT TRANSACTION;\n"
+
+        base, _ = os.path.splitext(sql_path)
+        self.manifesto_path = f"{base}_manifesto.json" if self.fragmentar else None
+        self.shards = []
+        self._parciais = []  # Caminhos finais dos arquivos ainda com o sufixo parcial
+        self.indices = []  # (caminho, array de deslocamentos) por arquivo não compactado
+        self.previa = ""
+        self.linhas = 0
+        self._bytes_fechados = 0
+        self._abrir_shard()
+
+    @property
+    def caminho_principal(self) -> str:
+        """Arquivo a ser oferecido ao usuário: o manifesto ou o script único"""
+        return self.manifesto_path or self._caminho
+
+    @property
+    def bytes_gravados(self) -> int:
+        return self._bytes_fechados + (0 if self._bruto.closed else self._bruto.bytes)
+
+    def _caminho_shard(self) -> str:
+        if self.fragmentar:
+            base, ext = os.path.splitext(self.sql_path)
+            caminho = f"{base}_{len(self.shards) + 1:04d}{ext}"
+        else:
+            caminho = self.sql_path
+        return caminho + ".gz" if self.compactar else caminho
+
+    def _abrir_shard(self):
+        self._caminho = self._caminho_shard()
+        self._bruto = _ArquivoComHash(self._caminho + SUFIXO_PARCIAL)
+        self._parciais.append(self._caminho)
+        if self.compactar:
+            binario = gzip.GzipFile(fileobj=self._bruto, mode="wb", mtime=0)  # mtime fixo: checksum reprodutível
+        else:
+            binario = io.BufferedWriter(self._bruto)
+        self._texto = io.TextIOWrapper(binario)  # Mesma codificação e quebra de linha de open(..., "w")
+        self.encoding = self._texto.encoding
+        self._deslocamentos = None if self.compactar else array('q')
+        self._fim_comandos = 0
+        self._escreveu = False
+        self._comandos_shard = 0
+        self._linhas_shard = 0
+        self._bytes_shard = 0
+        self._escrever(self.cabecalho)
+
+    def _fechar_shard(self):
+        self._escrever(self.rodape)
+        if self._deslocamentos is not None:
+            self._deslocamentos.append(self._fim_comandos)
+            self.indices.append((self._caminho, self._deslocamentos))
+        self._texto.close()
+        self._bruto.close()
+        self._bytes_fechados += self._bruto.bytes
+        self.shards.append({
+            "arquivo": os.path.basename(self._caminho),
+            "comandos": self._comandos_shard,
+            "linhas": self._linhas_shard,
+            "bytes": self._bruto.bytes,
+            "sha256": self._bruto.sha256.hexdigest(),
+        })
+
+    def _tamanho_bytes(self, texto: str) -> int:
+        """Bytes que `texto` ocupa no arquivo, já com a quebra de linha da plataforma"""
+        if texto.isascii():
+            return len(texto) + texto.count("\n") * (len(os.linesep) - 1)
+        return len(texto.replace("\n", os.linesep).encode(self.encoding))
+
+    def _indexar(self, textos: list):
+        """Registra onde cada comando vai começar, antes de gravá-los"""
+        if self._deslocamentos is None:
+            return
+        separador = len(os.linesep)
+        posicao = self._bytes_shard + (separador if self._escreveu else 0)
+        for texto in textos:
+            self._deslocamentos.append(posicao)
+            posicao += self._tamanho_bytes(texto) + separador
+
+    def _escrever(self, texto: str):
+        if not texto:
+            return
+        if self._escreveu:
+            texto = "\n" + texto  # Separador entre blocos, igual ao do join
+        self._texto.write(texto)
+        self._bytes_shard += self._tamanho_bytes(texto)
+        if len(self.previa) < TAMANHO_PREVIA:
+            self.previa += texto[:TAMANHO_PREVIA - len(self.previa)]
+        self._escreveu = True
+
+    def _shard_cheio(self, tamanho: int) -> bool:
+        if not self._comandos_shard:
+            return False
+        if self.max_comandos and self._comandos_shard >= self.max_comandos:
+            return True
+        return bool(self.max_bytes) and self._bytes_shard + tamanho > self.max_bytes
+
+    def escrever(self, comandos: list):
+        """Grava uma lista de pares `(texto, linhas)` na ordem recebida"""
+        if not self.fragmentar:
+            textos = [texto for texto, _ in comandos]
+            self._indexar(textos)
+            self._escrever("\n".join(textos))
+            self._fim_comandos = self._bytes_shard
+            self.linhas += sum(linhas for _, linhas in comandos)
+            return
+
+        for texto, linhas in comandos:
+            if self._shard_cheio(self._tamanho_bytes(texto)):
+                self._fechar_shard()
+                self._abrir_shard()
+            self._indexar([texto])
+            self._escrever(texto)
+            self._fim_comandos = self._bytes_shard
+            self._comandos_shard += 1
+            self._linhas_shard += linhas
+            self.linhas += linhas
+
+    def fechar(self):
+        """Fecha o arquivo corrente, dá o nome final aos arquivos e, se houver shards, grava o manifesto"""
+        if self._texto.closed:
+            return
+        self._fechar_shard()
+        for caminho in self._parciais:
+            os.replace(caminho + SUFIXO_PARCIAL, caminho)
+        self._parciais.clear()
+        if self.fragmentar:
+            with open(self.manifesto_path + SUFIXO_PARCIAL, "w") as f:
+                json.dump({"formato": self.formato, "shards": self.shards}, f, indent=2)
+            os.replace(self.manifesto_path + SUFIXO_PARCIAL, self.manifesto_path)
+        self._remover_antigos()
+
+    def _remover_antigos(self):
+        """Apaga shards e manifesto de execuções anteriores que a saída atual não usa.
+
+        Evita que um `_0005.sql` de uma execução maior fique ao lado do novo
+        manifesto e seja aplicado junto com os shards atuais.
+        """
+        base, ext = os.path.splitext(self.sql_path)
+        pasta = os.path.dirname(base) or "."
+        padrao = re.compile(rf"{re.escape(os.path.basename(base))}_\d{{4,}}{re.escape(ext)}(\.gz)?")
+        atuais = {shard["arquivo"] for shard in self.shards} if self.fragmentar else set()
+        for nome in os.listdir(pasta):
+            if padrao.fullmatch(nome) and nome not in atuais:
+                os.remove(os.path.join(pasta, nome))
+        if not self.fragmentar:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(f"{base}_manifesto.json")
+
+    def descartar(self):
+        """Fecha os arquivos sem rodapé nem manifesto e apaga os parciais"""
+        if not self._texto.closed:
+            try:
+                self._texto.close()
+            finally:
+                self._bruto.close()
+        for caminho in self._parciais:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(caminho + SUFIXO_PARCIAL)
+        self._parciais.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+class VisualizadorSql:
+    """Prévia paginada do script já gravado, lida sob demanda via mmap.
+
+    Usa os índices de comandos da `SaidaSql`; só o trecho pedido é decodificado.
+    """
+
+    def __init__(self, indices: list, encoding: str):
+        self.encoding = encoding
+        self.arquivos = [caminho for caminho, _ in indices]
+        self.deslocamentos = [deslocamentos for _, deslocamentos in indices]
+        # Número global do primeiro comando de cada arquivo
+        self.inicios = [0]
+        for deslocamentos in self.deslocamentos:
+            self.inicios.append(self.inicios[-1] + len(deslocamentos) - 1)
+        self._mapas = {}
+
+    @property
+    def total(self) -> int:
+        return self.inicios[-1]
+
+    def _mapa(self, arquivo: int) -> mmap.mmap:
+        if arquivo not in self._mapas:
+            with open(self.arquivos[arquivo], "rb") as f:
+                self._mapas[arquivo] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mapas[arquivo]
+
+    def _localizar(self, comando: int) -> tuple:
+        """Converte o número global do comando em (arquivo, comando dentro do arquivo)"""
+        arquivo = bisect_right(self.inicios, comando) - 1
+        return arquivo, comando - self.inicios[arquivo]
+
+    def _tamanho(self, comando: int) -> int:
+        """Bytes que o comando ocupa no arquivo"""
+        arquivo, local = self._localizar(comando)
+        deslocamentos = self.deslocamentos[arquivo]
+        return deslocamentos[local + 1] - deslocamentos[local]
+
+    def fim_pagina(self, inicio: int, quantidade: int, max_bytes: int = TAMANHO_PAGINA_BYTES) -> int:
+        """Primeiro comando depois da página que começa em `inicio` (sempre ao menos um comando)"""
+        fim, tamanho = inicio, 0
+        while fim < min(inicio + quantidade, self.total):
+            tamanho += self._tamanho(fim)
+            if fim > inicio and tamanho > max_bytes:
+                break
+            fim += 1
+        return fim
+
+    def inicio_pagina(self, fim: int, quantidade: int, max_bytes: int = TAMANHO_PAGINA_BYTES) -> int:
+        """Primeiro comando da página que termina logo antes de `fim`"""
+        inicio, tamanho = fim, 0
+        while inicio > max(fim - quantidade, 0):
+            tamanho += self._tamanho(inicio - 1)
+            if inicio < fim and tamanho > max_bytes:
+                break
+            inicio -= 1
+        return inicio
+
+    def pagina(self, inicio: int, quantidade: int, max_bytes: int = TAMANHO_PAGINA_BYTES) -> str:
+        """Texto dos comandos `inicio` até `inicio + quantidade - 1` (base 0).
+
+        Um comando maior que `max_bytes` é cortado na última linha completa.
+        """
+        partes = []
+        fim = min(inicio + quantidade, self.total)
+        while inicio < fim:
+            arquivo, local = self._localizar(inicio)
+            deslocamentos = self.deslocamentos[arquivo]
+            ultimo = min(local + fim - inicio, len(deslocamentos) - 1)
+            if ultimo == local:
+                break  # Arquivo sem comandos
+            mapa = self._mapa(arquivo)
+            de, ate = deslocamentos[local], deslocamentos[ultimo]
+            cortado = ate - de > max_bytes
+            if cortado:
+                quebra = mapa.rfind(b"\n", de, de + max_bytes)
+                ate = quebra if quebra > de else de + max_bytes
+            partes.append(mapa[de:ate].decode(self.encoding, errors="ignore").replace("\r\n", "\n").rstrip("\r"))
+            if cortado:
+                partes.append(f"-- ... comando truncado na prévia ({deslocamentos[ultimo] - de:,} bytes)")
+                break
+            inicio += ultimo - local
+        return "\n".join(partes)
+
+    def buscar(self, termo: str, a_partir: int = 0):
+        """Número do primeiro comando a partir de `a_partir` que contém `termo`, ou None"""
+        if a_partir >= self.total:
+            return None
+        alvo = termo.encode(self.encoding)
+        arquivo, local = self._localizar(a_partir)
+        for indice in range(arquivo, len(self.arquivos)):
+            deslocamentos = self.deslocamentos[indice]
+            if len(deslocamentos) < 2:
+                continue
+            inicio = deslocamentos[local] if indice == arquivo else deslocamentos[0]
+            posicao = self._mapa(indice).find(alvo, inicio, deslocamentos[-1])
+            if posicao >= 0:
+                return self.inicios[indice] + bisect_right(deslocamentos, posicao) - 1
+        return None
+
+    def fechar(self):
+        for mapa in self._mapas.values():
+            mapa.close()
+        self._mapas.clear()
+
+def escrever_sql(sql_path: str, blocos, formato: str = FORMATO_POR_LINHA, progresso=None,
+                 **opcoes_saida) -> SaidaSql:
+    """Grava o cabeçalho, cada bloco de comandos na ordem recebida e o rodapé.
+
+    `opcoes_saida` são repassadas para `SaidaSql` (compactar, max_comandos, max_bytes).
+    `progresso(linhas, bytes_gravados)` é chamado ao fim de cada bloco.
+    """
+    with SaidaSql(sql_path, formato, **opcoes_saida) as saida:
+        for comandos in blocos:
+            saida.escrever(comandos)
+            if progresso:
+                progresso(saida.linhas, saida.bytes_gravados)
+    return saida
+
+def gerar_sql_streaming(csv_path: str, sql_path: str, tamanho_bloco: int = TAMANHO_BLOCO_CSV,
+                        progresso=None, formato: str = FORMATO_POR_LINHA,
+                        tamanho_lote: int = TAMANHO_LOTE_INSERT, filtro=None,
+                        rejeitados: list = None, **opcoes_saida) -> SaidaSql:
+    """Lê o CSV em blocos e grava o SQL de cada bloco direto no arquivo.
+
+    A memória fica limitada a um bloco por vez, independente do tamanho do CSV.
+    `filtro(df) -> df`, se informado, é aplicado a cada bloco antes da geração.
+    """
+    chunks = ler_csv(csv_path, rejeitados, tamanho_bloco)
+    if filtro:
+        chunks = (filtro(chunk) for chunk in chunks)
+    blocos = (gerar_comandos(chunk, formato, tamanho_lote) for chunk in chunks)
+    return escrever_sql(sql_path, blocos, formato, progresso, **opcoes_saida)
+
+def dividir_csv_em_faixas(csv_path: str, tamanho_faixa: int = TAMANHO_FAIXA_BYTES):
+    """Divide o CSV em faixas de bytes alinhadas ao fim de linha.
+
+    Retorna a linha de cabeçalho (bytes) e a lista de faixas `(inicio, fim)`.
+    Campos com quebra de linha entre aspas não são suportados.
+    """
+    tamanho_arquivo = os.path.getsize(csv_path)
+    faixas = []
+    with open(csv_path, "rb") as f:
+        cabecalho = f.readline()
+        inicio = f.tell()
+        while inicio < tamanho_arquivo:
+            f.seek(min(inicio + tamanho_faixa, tamanho_arquivo))
+            f.readline()  # Avança até o fim da linha corrente
+            fim = min(f.tell(), tamanho_arquivo)
+            faixas.append((inicio, fim))
+            inicio = fim
+    return cabecalho, faixas
+
+def _formatar_faixa(csv_path: str, cabecalho: bytes, inicio: int, fim: int,
+                    formato: str, tamanho_lote: int):
+    """Executado no processo filho: lê uma faixa do CSV e gera o SQL correspondente.
+
+    Retorna os comandos e as linhas rejeitadas (sem número de linha, que a faixa não conhece).
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(inicio)
+        dados = f.read(fim - inicio)
+
+    malformadas = []
+
+    def rejeitar_linha(linha) -> str:
+        malformadas.append((pd.NA, f"esperadas {linha.expected_columns} colunas, encontradas {linha.actual_columns}", linha.text))
+        return 'skip'
+
+    tabela = pa_csv.read_csv(io.BytesIO(cabecalho + dados), **_opcoes_csv(rejeitar_linha))
+    # Sem o número da linha, o índice é `inicio + posição na faixa`: cada linha tem ao
+    # menos um byte, então a ordem entre faixas é a do arquivo (usada no Seq do staging)
+    df, rejeitadas = validar_tabela(tabela, inicio + np.arange(tabela.num_rows))
+    rejeitadas['LINHA_CSV'] = pd.NA
+    if malformadas:
+        rejeitadas = pd.concat([rejeitadas, pd.DataFrame(malformadas, columns=rejeitadas.columns)])
+    return gerar_comandos(df, formato, tamanho_lote), rejeitadas
+
+def gerar_sql_paralelo(csv_path: str, sql_path: str, workers: int = None,
+                       progresso=None, formato: str = FORMATO_POR_LINHA,
+                       tamanho_lote: int = TAMANHO_LOTE_INSERT,
+                       tamanho_faixa: int = TAMANHO_FAIXA_BYTES, rejeitados: list = None,
+                       **opcoes_saida) -> SaidaSql:
+    """Gera o SQL formatando faixas do CSV em paralelo num ProcessPoolExecutor.
+
+    Os resultados são gravados na ordem original do arquivo; no máximo
+    `2 * workers` faixas ficam em memória ao mesmo tempo.
+    """
+    workers = workers or os.cpu_count() or 1
+    cabecalho, faixas = dividir_csv_em_faixas(csv_path, tamanho_faixa)
+
+    def resultados_em_ordem(pool: ProcessPoolExecutor):
+        pendentes = deque()
+
+        def proximo():
+            comandos, rejeitadas = pendentes.popleft().result()
+            if rejeitados is not None and len(rejeitadas):
+                rejeitados.append(rejeitadas)
+            return comandos
+
+        for inicio, fim in faixas:
+            pendentes.append(pool.submit(_formatar_faixa, csv_path, cabecalho, inicio, fim, formato, tamanho_lote))
+            if len(pendentes) >= 2 * workers:
+                yield proximo()
+        while pendentes:
+            yield proximo()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            return escrever_sql(sql_path, resultados_em_ordem(pool), formato, progresso, **opcoes_saida)
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)  # Não espera as faixas ainda na fila
+            raise
+
+def benchmark_paralelo(csv_path: str, workers=(1, 2, 4, 8), formato: str = FORMATO_POR_LINHA,
+                       tamanho_faixa: int = TAMANHO_FAIXA_BYTES) -> list:
+    """Mede o tempo de `gerar_sql_paralelo` para cada quantidade de processos"""
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        sql_path = os.path.join(pasta, "benchmark.sql")
+        for n in workers:
+            inicio = time.perf_counter()
+            gerar_sql_paralelo(csv_path, sql_path, workers=n, formato=formato, tamanho_faixa=tamanho_faixa)
+            segundos = time.perf_counter() - inicio
+            resultados.append((n, segundos))
+            print(f"{n} processo(s): {segundos:.2f} s (speedup {resultados[0][1] / segundos:.2f}x)")
+    return resultados
+
+class Deduplicador:
+    """Remove chaves repetidas do CSV mantendo a última ocorrência.
+
+    A primeira passada guarda só um hash de 64 bits da chave e dos valores de
+    cada linha; a segunda aplica a máscara bloco a bloco, na mesma ordem.
+    """
+
+    def __init__(self):
+        self.manter = np.ones(0, dtype=bool)
+        self.conflito = np.zeros(0, dtype=bool)
+        self.removidas = 0
+        self.chaves_conflitantes = 0
+        self.conflitos = []
+        self._posicao = 0
+
+    def indexar(self, chunks):
+        """Primeira passada: calcula quais linhas manter e quais chaves têm conflito"""
+        hashes_chave, hashes_valor = [], []
+        for chunk in chunks:
+            cols = formatar_colunas(chunk)
+            hashes_chave.append(pd.util.hash_pandas_object(cols[COLUNAS_CHAVE], index=False).to_numpy())
+            hashes_valor.append(pd.util.hash_pandas_object(cols[COLUNAS_VALOR], index=False).to_numpy())
+
+        tabela = pd.DataFrame({
+            'chave': np.concatenate(hashes_chave) if hashes_chave else np.zeros(0, dtype=np.uint64),
+            'valor': np.concatenate(hashes_valor) if hashes_valor else np.zeros(0, dtype=np.uint64),
+        })
+        self.manter = ~tabela.duplicated('chave', keep='last').to_numpy()
+        valores_por_chave = tabela.groupby('chave')['valor'].transform('nunique').to_numpy()
+        self.conflito = valores_por_chave > 1
+        self.removidas = int((~self.manter).sum())
+        self.chaves_conflitantes = int(tabela.loc[self.conflito, 'chave'].nunique())
+        self._posicao = 0
+        self.conflitos = []
+
+    def filtrar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Segunda passada: descarta as repetições e separa as linhas em conflito para o relatório"""
+        inicio, self._posicao = self._posicao, self._posicao + len(df)
+        conflito = self.conflito[inicio:self._posicao]
+        if conflito.any():
+            linhas = formatar_colunas(df[conflito]).copy()
+            linhas.insert(0, 'LINHA_CSV', df.index[conflito] + 2)  # +1 cabeçalho, +1 base 1
+            self.conflitos.append(linhas)
+        return df[self.manter[inicio:self._posicao]]
+
+    def gravar_relatorio(self, caminho: str = RELATORIO_CONFLITOS_PATH) -> int:
+        """Grava as linhas das chaves conflitantes; retorna quantas chaves foram reportadas"""
+        if not self.conflitos:
+            if os.path.exists(caminho):
+                os.remove(caminho)  # Não deixa relatório de uma execução anterior
+            return 0
+        relatorio = pd.concat(self.conflitos).sort_values(COLUNAS_CHAVE + ['LINHA_CSV'], kind='stable')
+        relatorio.to_csv(caminho, sep=';', index=False)
+        return self.chaves_conflitantes
+
+class ManifestoEmissao:
+    """Registro em disco (SQLite) dos últimos valores emitidos para cada chave do CTE_peca.
+
+    A consulta é feita por bloco dentro do próprio SQLite, então o manifesto
+    pode ter milhões de chaves sem ser carregado em memória.
+    """
+
+    def __init__(self, caminho: str = MANIFESTO_PATH):
+        self.conn = sqlite3.connect(caminho)
+        self.ignoradas = 0
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS emitidos (
+            Nro_rolo TEXT NOT NULL,
+            Nro_peca TEXT NOT NULL,
+            Sublote TEXT NOT NULL,
+            Aviso TEXT NOT NULL,
+            Tear TEXT,
+            Num_Etq_Aux TEXT,
+            PRIMARY KEY (Nro_rolo, Nro_peca, Sublote, Aviso)
+        ) WITHOUT ROWID""")
+        self.conn.execute("""CREATE TEMP TABLE IF NOT EXISTS bloco (
+            pos INTEGER PRIMARY KEY,
+            Nro_rolo TEXT, Nro_peca TEXT, Sublote TEXT, Aviso TEXT,
+            Tear TEXT, Num_Etq_Aux TEXT
+        )""")
+
+    def filtrar_alterados(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Retorna só as linhas novas ou alteradas e registra seus valores no manifesto"""
+        total = len(df)
+        cols = formatar_colunas(df)
+        # Só a última ocorrência de cada chave no bloco é comparada: as anteriores seriam
+        # sobrescritas por ela, e comparadas com o manifesto reaplicariam valores antigos
+        ultimas = ~cols.duplicated(COLUNAS_CHAVE, keep='last').to_numpy()
+        if not ultimas.all():
+            df, cols = df[ultimas], cols[ultimas]
+        self.conn.execute("DELETE FROM bloco")
+        self.conn.executemany(
+            "INSERT INTO bloco VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(range(len(cols)), cols['NRO_ROLO'], cols['NRO_PECA'], cols['LOTE'],
+                cols['AVISO'], cols['TEAR'], cols['Num_Etq_Aux'])
+        )
+        posicoes = [pos for (pos,) in self.conn.execute("""
+            SELECT b.pos FROM bloco b
+            LEFT JOIN emitidos e
+                ON e.Nro_rolo = b.Nro_rolo AND e.Nro_peca = b.Nro_peca
+                AND e.Sublote = b.Sublote AND e.Aviso = b.Aviso
+            WHERE e.Nro_rolo IS NULL OR e.Tear IS NOT b.Tear OR e.Num_Etq_Aux IS NOT b.Num_Etq_Aux
+            ORDER BY b.pos
+        """)]
+        self.conn.execute("""
+            INSERT OR REPLACE INTO emitidos
+            SELECT Nro_rolo, Nro_peca, Sublote, Aviso, Tear, Num_Etq_Aux FROM bloco ORDER BY pos
+        """)
+        self.ignoradas += total - len(posicoes)
+        return df.iloc[posicoes]
+
+    def confirmar(self):
+        """Grava no manifesto o que foi emitido; chamar só após gerar a saída com sucesso"""
+        self.conn.commit()
+
+    def fechar(self):
+        """Fecha o manifesto, descartando o que não foi confirmado"""
+        self.conn.rollback()
+        self.conn.close()
+
+def conectar_banco(destino: str):
+    """Abre a conexão: arquivo SQLite (.db/.sqlite) ou string de conexão ODBC"""
+    if destino.lower().endswith(('.db', '.sqlite', '.sqlite3')):
+        return sqlite3.connect(destino)
+    try:
+        import pyodbc
+    except ImportError:
+        raise RuntimeError("Conexão ODBC requer o pacote pyodbc (pip install pyodbc)")
+    return pyodbc.connect(destino)
+
+def aplicar_no_banco(conn, blocos, tamanho_lote: int = TAMANHO_LOTE_EXECUTEMANY,
+                     intervalo_commit: int = INTERVALO_COMMIT, progresso=None) -> dict:
+    """Aplica os UPDATEs com parâmetros via executemany, em lotes e com commits periódicos.
+
+    `blocos` é um iterável de DataFrames (ex.: `ler_csv(...)`).
+    `progresso(linhas, linhas_por_segundo)` é chamado após cada lote.
+    Em caso de erro, só o trecho ainda não confirmado é desfeito.
+    """
+    if tamanho_lote < 1 or intervalo_commit < 1:
+        raise ValueError("Tamanho do lote e intervalo de commit devem ser positivos")
+
+    cursor = conn.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True  # pyodbc: envia o lote inteiro de uma vez
+
+    inicio = time.perf_counter()
+    linhas = 0
+    pendentes = 0
+    try:
+        for df in blocos:
+            cols = formatar_colunas(df)
+            parametros = list(zip(
+                cols['TEAR'], cols['Num_Etq_Aux'],
+                cols['NRO_ROLO'], cols['NRO_PECA'], cols['LOTE'], cols['AVISO']
+            ))
+            for i in range(0, len(parametros), tamanho_lote):
+                lote = parametros[i:i + tamanho_lote]
+                cursor.executemany(SQL_UPDATE_PARAMETRIZADO, lote)
+                linhas += len(lote)
+                pendentes += len(lote)
+                if pendentes >= intervalo_commit:
+                    conn.commit()
+                    pendentes = 0
+                if progresso:
+                    progresso(linhas, linhas / max(time.perf_counter() - inicio, 1e-9))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "linhas": linhas,
+        "segundos": segundos,
+        "linhas_por_segundo": linhas / max(segundos, 1e-9),
+    }
+
+OPCOES_PADRAO = {
+    "formato": FORMATO_POR_LINHA,
+    "tamanho_lote": TAMANHO_LOTE_INSERT,
+    "streaming": False,
+    "paralelo": False,
+    "workers": None,
+    "deduplicar": False,
+    "incremental": False,
+    "compactar": False,
+    "max_comandos": None,
+    "max_bytes": None,
+    "banco": "",
+    "lote_executemany": TAMANHO_LOTE_EXECUTEMANY,
+    "intervalo_commit": INTERVALO_COMMIT,
+}
+
+# O manifesto incremental é um só arquivo: gerações incrementais rodam uma por vez
+_manifesto_lock = threading.Lock()
+
+class GeracaoCancelada(Exception):
+    """Geração interrompida pelo usuário"""
+
+def contar_linhas_csv(csv_path: str) -> int:
+    """Conta as linhas de dados do CSV (sem o cabeçalho) lendo o arquivo em blocos"""
+    linhas = 0
+    with open(csv_path, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            linhas += bloco.count(b"\n")
+    return max(linhas - 1, 0)
+
+def processar_csv(csv_path: str, sql_path: str = SQL_PATH,
+                  relatorio_path: str = RELATORIO_CONFLITOS_PATH,
+                  opcoes: dict = None, progresso=None,
+                  rejeitados_path: str = REJEITADOS_PATH) -> dict:
+    """Gera o SQL (ou aplica direto no banco) para um CSV com as opções de `OPCOES_PADRAO`.
+
+    `progresso(linhas_lidas, detalhe)` é chamado a cada bloco; se lançar
+    `GeracaoCancelada`, a geração é interrompida e nada é confirmado no manifesto.
+    Retorna `{"mensagem": str, "saida": SaidaSql | None}`.
+    """
+    opcoes = {**OPCOES_PADRAO, **(opcoes or {})}
+    avisar = progresso or (lambda linhas, detalhe: None)
+    formato = opcoes["formato"]
+    tamanho_lote = opcoes["tamanho_lote"]
+
+    paralelo = opcoes["paralelo"] and formato != FORMATO_DIRETO
+    if paralelo and opcoes["incremental"]:
+        raise ValueError("O modo incremental não pode ser usado com o modo paralelo")
+
+    # A remoção de repetidas precisa ver o arquivo inteiro na ordem; no modo paralelo é ignorada
+    ignorar_deduplicacao = paralelo and opcoes["deduplicar"]
+
+    deduplicador = None
+    if opcoes["deduplicar"] and not ignorar_deduplicacao:
+        deduplicador = Deduplicador()
+
+        def chunks_indexacao():
+            indexadas = 0
+            for chunk in ler_csv(csv_path):
+                indexadas += len(chunk)
+                avisar(0, f"Indexando chaves: {indexadas:,} linhas...")
+                yield chunk
+
+        deduplicador.indexar(chunks_indexacao())
+
+    with _manifesto_lock if opcoes["incremental"] else contextlib.nullcontext():
+        manifesto = ManifestoEmissao() if opcoes["incremental"] else None
+        rejeitados = []
+        lidas = 0
+
+        def filtro(df: pd.DataFrame) -> pd.DataFrame:
+            nonlocal lidas
+            lidas += len(df)
+            if deduplicador:
+                df = deduplicador.filtrar(df)
+            if manifesto:
+                df = manifesto.filtrar_alterados(df)
+            return df
+
+        saida = None
+        try:
+            if formato == FORMATO_DIRETO:
+                def mostrar_vazao(linhas: int, linhas_por_segundo: float):
+                    avisar(lidas, f"{linhas:,} linhas aplicadas ({linhas_por_segundo:,.0f} linhas/s)...")
+
+                chunks = (filtro(chunk) for chunk in ler_csv(csv_path, rejeitados))
+                conn = conectar_banco(opcoes["banco"].strip())
+                try:
+                    resultado = aplicar_no_banco(
+                        conn,
+                        chunks,
+                        tamanho_lote=opcoes["lote_executemany"],
+                        intervalo_commit=opcoes["intervalo_commit"],
+                        progresso=mostrar_vazao
+                    )
+                finally:
+                    conn.close()
+
+                mensagem = (
+                    f"{resultado['linhas']:,} linhas aplicadas em {resultado['segundos']:.1f} s "
+                    f"({resultado['linhas_por_segundo']:,.0f} linhas/s)."
+                )
+            else:
+                def mostrar_progresso(linhas: int, bytes_gravados: int):
+                    avisar(lidas or linhas, f"{linhas:,} linhas processadas, {bytes_gravados:,} bytes gravados...")
+
+                opcoes_saida = {
+                    "compactar": opcoes["compactar"],
+                    "max_comandos": opcoes["max_comandos"],
+                    "max_bytes": opcoes["max_bytes"],
+                }
+                if opcoes["paralelo"]:
+                    saida = gerar_sql_paralelo(
+                        csv_path, sql_path, workers=opcoes["workers"],
+                        progresso=mostrar_progresso, formato=formato, tamanho_lote=tamanho_lote,
+                        rejeitados=rejeitados, **opcoes_saida
+                    )
+                elif opcoes["streaming"]:
+                    saida = gerar_sql_streaming(
+                        csv_path, sql_path, progresso=mostrar_progresso,
+                        formato=formato, tamanho_lote=tamanho_lote, filtro=filtro,
+                        rejeitados=rejeitados, **opcoes_saida
+                    )
+                else:
+                    # Arquivo inteiro num único bloco (em blocos de 1 GiB acima desse tamanho)
+                    blocos = [
+                        gerar_comandos(filtro(df), formato, tamanho_lote)
+                        for df in ler_csv(csv_path, rejeitados, tamanho_bloco=max(os.path.getsize(csv_path), 1))
+                    ]
+                    saida = escrever_sql(sql_path, blocos, formato, mostrar_progresso, **opcoes_saida)
+
+                mensagem = "Arquivo SQL gerado com sucesso!"
+                if saida.fragmentar:
+                    mensagem = f"{len(saida.shards)} arquivos SQL gerados (ver {os.path.basename(saida.caminho_principal)})."
+
+            rejeitadas = gravar_rejeitados(rejeitados, rejeitados_path)
+            if rejeitadas:
+                mensagem += f" ⚠ {rejeitadas:,} linhas inválidas rejeitadas (ver {rejeitados_path})."
+            if deduplicador:
+                conflitantes = deduplicador.gravar_relatorio(relatorio_path)
+                mensagem += f" {deduplicador.removidas:,} linhas repetidas removidas."
+                if conflitantes:
+                    mensagem += f" ⚠ {conflitantes:,} chaves com valores diferentes (ver {relatorio_path})."
+            if ignorar_deduplicacao:
+                mensagem += " Remoção de repetidas não disponível no modo paralelo; nenhuma linha foi removida."
+            if manifesto:
+                manifesto.confirmar()
+                mensagem += f" {manifesto.ignoradas:,} linhas sem alteração foram ignoradas."
+        finally:
+            if manifesto:
+                manifesto.fechar()
+
+    return {"mensagem": mensagem, "saida": saida}
+
+class FilaGeracao:
+    """Executa gerações fora da thread da UI, em fila, com paralelismo configurável e cancelamento"""
+
+    def __init__(self, paralelismo: int = 1):
+        self._pool = ThreadPoolExecutor(max_workers=max(paralelismo, 1), thread_name_prefix="geracao")
+        self._cancelado = threading.Event()
+        self._futuros = []
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelado.is_set()
+
+    def verificar_cancelamento(self):
+        """Chamado pelas tarefas entre blocos; interrompe a tarefa se houve cancelamento"""
+        if self._cancelado.is_set():
+            raise GeracaoCancelada("Geração cancelada pelo usuário")
+
+    def enfileirar(self, tarefa, *args, **kwargs) -> Future:
+        futuro = self._pool.submit(self._executar, tarefa, *args, **kwargs)
+        self._futuros.append(futuro)
+        return futuro
+
+    def _executar(self, tarefa, *args, **kwargs):
+        self.verificar_cancelamento()
+        return tarefa(*args, **kwargs)
+
+    def cancelar(self):
+        """Cancela as tarefas na fila e sinaliza as que estão em andamento"""
+        self._cancelado.set()
+        for futuro in self._futuros:
+            futuro.cancel()
+
+    def encerrar(self):
+        self._pool.shutdown(wait=False)
 
 def main(page: ft.Page):
     page.title = "Gerador de SQL para CTE_peca"
@@ -26,51 +1139,351 @@ def main(page: ft.Page):
         visible=False
     )
 
+    selecionar_button = ft.ElevatedButton(
+        "Selecionar CSV",
+        icon=Icons.UPLOAD_FILE
+    )
+
+    formato_dropdown = ft.Dropdown(
+        label="Formato de saída",
+        width=320,
+        value=FORMATO_POR_LINHA,
+        options=[
+            ft.dropdown.Option(FORMATO_POR_LINHA, "Um UPDATE por linha"),
+            ft.dropdown.Option(FORMATO_STAGING, "Staging + UPDATE único (em lote)"),
+            ft.dropdown.Option(FORMATO_DIRETO, "Aplicar direto no banco"),
+        ]
+    )
+    tamanho_lote_input = ft.TextField(
+        label="Linhas por INSERT",
+        width=160,
+        value=str(TAMANHO_LOTE_INSERT),
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+
+    banco_input = ft.TextField(
+        label="Banco (arquivo SQLite ou string ODBC)",
+        width=420
+    )
+    lote_executemany_input = ft.TextField(
+        label="Linhas por lote",
+        width=140,
+        value=str(TAMANHO_LOTE_EXECUTEMANY),
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+    intervalo_commit_input = ft.TextField(
+        label="Linhas por commit",
+        width=140,
+        value=str(INTERVALO_COMMIT),
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+    banco_row = ft.Row(
+        [banco_input, lote_executemany_input, intervalo_commit_input],
+        spacing=10,
+        visible=False
+    )
+
+    def on_formato_change(e):
+        banco_row.visible = formato_dropdown.value == FORMATO_DIRETO
+        tamanho_lote_input.visible = formato_dropdown.value == FORMATO_STAGING
+        page.update()
+
+    formato_dropdown.on_change = on_formato_change
+    tamanho_lote_input.visible = False
+
+    streaming_switch = ft.Switch(
+        label="Modo streaming (memória constante para arquivos grandes)",
+        value=False
+    )
+
+    paralelo_switch = ft.Switch(
+        label="Modo paralelo (vários processos)",
+        value=False
+    )
+    workers_input = ft.TextField(
+        label="Processos",
+        width=120,
+        value=str(os.cpu_count() or 1),
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+
+    deduplicar_switch = ft.Switch(
+        label="Remover chaves repetidas (mantém a última) e gerar relatório de conflitos",
+        value=False
+    )
+
+    incremental_switch = ft.Switch(
+        label="Somente alterações desde a última geração (incremental)",
+        value=False
+    )
+
+    compactar_switch = ft.Switch(
+        label="Compactar saída (.sql.gz)",
+        value=False
+    )
+    max_comandos_input = ft.TextField(
+        label="Comandos por arquivo (0 = sem limite)",
+        width=250,
+        value="0",
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+    max_mb_input = ft.TextField(
+        label="MB por arquivo (0 = sem limite)",
+        width=220,
+        value="0",
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+
     file_picker = ft.FilePicker()
     page.overlay.append(file_picker)
 
-    def gerar_update_sql(df: pd.DataFrame) -> str:
-        df['NRO_ROLO'] = df['NRO_ROLO'].astype(str).str.zfill(10)
-        df['NRO_PECA'] = df['NRO_PECA'].astype(int).astype(str).str.zfill(3)
-        df['AVISO'] = df['AVISO'].astype(str).str.zfill(6)
-        df['TEAR'] = df['TEAR'].astype(str).str.zfill(6)
-
-        updates = []
-        for _, row in df.iterrows():
-            updates.append(
-                f"""UPDATE CTE_peca
-SET Tear = '{row['TEAR']}', Num_Etq_Aux = '{row['Num_Etq_Aux']}'
-WHERE Nro_rolo = '{row['NRO_ROLO']}' AND Nro_peca = '{row['NRO_PECA']}' AND Sublote = '{row['LOTE']}' AND Aviso = '{row['AVISO']}';\n"""
-            )
-        return "\n".join(updates)
+    paralelismo_input = ft.TextField(
+        label="Arquivos em paralelo",
+        width=180,
+        value="1",
+        keyboard_type=ft.KeyboardType.NUMBER
+    )
+
+    progress_bar = ft.ProgressBar(value=0, visible=False, expand=True)
+    status_arquivos = ft.Column(spacing=2)
+    cancel_button = ft.ElevatedButton(
+        "Cancelar",
+        icon=Icons.CANCEL,
+        visible=False
+    )
+
+    fila = None
+    em_andamento = False  # Uma fila por vez: todas gravam nos mesmos arquivos de saída
+    trava_fila = threading.Lock()
+    visualizador = None
+    pagina_inicio = 0
+    ultima_busca = ""
+
+    pagina_text = ft.Text()
+
+    def mostrar_pagina(inicio: int):
+        """Carrega no TextField só os comandos da página pedida"""
+        nonlocal pagina_inicio
+        total = visualizador.total
+        pagina_inicio = max(0, min(inicio, total - 1))
+        fim = visualizador.fim_pagina(pagina_inicio, TAMANHO_PAGINA)
+        sql_preview.value = visualizador.pagina(pagina_inicio, fim - pagina_inicio)
+        pagina_text.value = f"Comandos {pagina_inicio + 1:,}–{fim:,} de {total:,}"
+        page.update()
+
+    def pagina_anterior(e):
+        if visualizador and pagina_inicio > 0:
+            mostrar_pagina(visualizador.inicio_pagina(pagina_inicio, TAMANHO_PAGINA))
+
+    def pagina_seguinte(e):
+        if not visualizador:
+            return
+        fim = visualizador.fim_pagina(pagina_inicio, TAMANHO_PAGINA)
+        if fim < visualizador.total:
+            mostrar_pagina(fim)
+
+    def ir_para_comando(e):
+        if not visualizador:
+            return
+        try:
+            mostrar_pagina(int(ir_para_input.value) - 1)
+        except ValueError:
+            output_text.value = "Informe o número do comando."
+            page.update()
+
+    def buscar_rolo(e):
+        """Vai para o próximo comando com o Nro_rolo informado, voltando ao início se preciso"""
+        nonlocal ultima_busca
+        rolo = buscar_rolo_input.value.strip()
+        if not visualizador or not rolo:
+            return
+        termo = f"'{rolo.zfill(ESQUEMA_CSV['NRO_ROLO'])}'"
+        a_partir = pagina_inicio + 1 if termo == ultima_busca else 0
+        ultima_busca = termo
+        encontrado = visualizador.buscar(termo, a_partir)
+        if encontrado is None and a_partir:
+            encontrado = visualizador.buscar(termo, 0)
+        if encontrado is None:
+            output_text.value = f"Nro_rolo {rolo} não encontrado."
+            page.update()
+            return
+        mostrar_pagina(encontrado)
+
+    ir_para_input = ft.TextField(
+        label="Ir para comando nº",
+        width=160,
+        keyboard_type=ft.KeyboardType.NUMBER,
+        on_submit=ir_para_comando
+    )
+    buscar_rolo_input = ft.TextField(
+        label="Buscar Nro_rolo",
+        width=180,
+        on_submit=buscar_rolo
+    )
+    navegacao_row = ft.Row(
+        [
+            ft.IconButton(Icons.CHEVRON_LEFT, tooltip="Página anterior", on_click=pagina_anterior),
+            pagina_text,
+            ft.IconButton(Icons.CHEVRON_RIGHT, tooltip="Próxima página", on_click=pagina_seguinte),
+            ir_para_input,
+            buscar_rolo_input,
+            ft.IconButton(Icons.SEARCH, tooltip="Buscar", on_click=buscar_rolo),
+        ],
+        spacing=10,
+        visible=False
+    )
+
+    def ler_opcoes() -> dict:
+        """Lê as opções da tela no momento da seleção dos arquivos"""
+        return {
+            "formato": formato_dropdown.value,
+            "tamanho_lote": int(tamanho_lote_input.value),
+            "streaming": streaming_switch.value,
+            "paralelo": paralelo_switch.value,
+            "workers": int(workers_input.value),
+            "deduplicar": deduplicar_switch.value,
+            "incremental": incremental_switch.value,
+            "compactar": compactar_switch.value,
+            "max_comandos": int(max_comandos_input.value or 0) or None,
+            "max_bytes": int(float(max_mb_input.value or 0) * 1024 * 1024) or None,
+            "banco": banco_input.value,
+            "lote_executemany": int(lote_executemany_input.value),
+            "intervalo_commit": int(intervalo_commit_input.value),
+        }
+
+    def fechar_visualizador():
+        nonlocal visualizador
+        if visualizador:
+            visualizador.fechar()
+            visualizador = None
+        navegacao_row.visible = False
+
+    def abrir_visualizador(saida: SaidaSql):
+        nonlocal visualizador
+        fechar_visualizador()
+        if saida.indices:
+            visualizador = VisualizadorSql(saida.indices, saida.encoding)
+            navegacao_row.visible = True
+            mostrar_pagina(0)
+        else:
+            sql_preview.value = saida.previa  # Saída compactada: só o início do script
 
     def on_file_selected(e: ft.FilePickerResultEvent):
-        nonlocal sql_path
+        nonlocal fila, em_andamento
         if not e.files:
             output_text.value = "Nenhum arquivo selecionado."
             page.update()
             return
 
         try:
-            file = e.files[0]
-            df = pd.read_csv(file.path, sep=';')
-            sql_content = gerar_update_sql(df)
+            opcoes = ler_opcoes()
+            paralelismo = int(paralelismo_input.value)
+        except ValueError as ex:
+            output_text.value = f"Erro: {ex}"
+            page.update()
+            return
+
+        arquivos = list(dict.fromkeys(file.path for file in e.files))
+        varios = len(arquivos) > 1
+        totais = {caminho: contar_linhas_csv(caminho) for caminho in arquivos}
+        lidas = {caminho: 0 for caminho in arquivos}
+        textos = {caminho: ft.Text(f"{os.path.basename(caminho)}: na fila") for caminho in arquivos}
+        pendentes = len(arquivos)
+        trava = threading.Lock()
+
+        with trava_fila:
+            if em_andamento:
+                output_text.value = "Aguarde o fim da geração em andamento ou cancele-a."
+                page.update()
+                return
+            em_andamento = True
+
+        fechar_visualizador()  # Libera o mmap antes de regravar o arquivo
+        fila = FilaGeracao(paralelismo)
+        status_arquivos.controls = list(textos.values())
+        progress_bar.value = 0
+        progress_bar.visible = True
+        cancel_button.visible = True
+        selecionar_button.disabled = True
+        download_button.visible = False
+        output_text.value = f"Processando {len(arquivos)} arquivo(s)..."
+        page.update()
 
-            sql_preview.value = sql_content[:3000]  # Mostra apenas os primeiros 3000 caracteres
-            sql_path = "atualizar_CTE_peca.sql"
-            with open(sql_path, "w") as f:
-                f.write(sql_content)
+        def atualizar_barra():
+            total = sum(totais.values())
+            progress_bar.value = sum(lidas.values()) / total if total else None
 
-            output_text.value = "Arquivo SQL gerado com sucesso!"
-            download_button.visible = True
+        def criar_progresso(caminho: str, fila_atual: FilaGeracao):
+            def progresso(linhas: int, detalhe: str):
+                fila_atual.verificar_cancelamento()
+                lidas[caminho] = linhas
+                textos[caminho].value = f"{os.path.basename(caminho)}: {detalhe}"
+                atualizar_barra()
+                page.update()
+            return progresso
+
+        def concluir(caminho: str, futuro: Future):
+            nonlocal sql_path, pendentes, em_andamento
+            nome = os.path.basename(caminho)
+            if futuro.cancelled():
+                textos[caminho].value = f"{nome}: cancelado"
+            elif isinstance(futuro.exception(), GeracaoCancelada):
+                textos[caminho].value = f"{nome}: cancelado"
+            elif futuro.exception():
+                textos[caminho].value = f"{nome}: erro: {futuro.exception()}"
+            else:
+                resultado = futuro.result()
+                lidas[caminho] = totais[caminho]
+                textos[caminho].value = f"{nome}: {resultado['mensagem']}"
+                if resultado["saida"]:
+                    # Com vários arquivos em paralelo, outra tarefa pode estar trocando a prévia agora
+                    with trava:
+                        abrir_visualizador(resultado["saida"])
+                        sql_path = resultado["saida"].caminho_principal
+                        download_button.visible = True
+
+            with trava:
+                pendentes -= 1
+                terminou = pendentes == 0
+            atualizar_barra()
+            if terminou:
+                progress_bar.visible = False
+                cancel_button.visible = False
+                output_text.value = "Geração cancelada." if fila_atual.cancelado else "Processamento concluído."
+                fila_atual.encerrar()
+                with trava_fila:
+                    em_andamento = False
+                selecionar_button.disabled = False
             page.update()
 
-        except Exception as ex:
-            output_text.value = f"Erro: {ex}"
+        fila_atual = fila
+        for caminho in arquivos:
+            # Vários arquivos na mesma seleção geram saídas separadas, nomeadas pelo CSV
+            sufixo = f"_{os.path.splitext(os.path.basename(caminho))[0]}" if varios else ""
+            base_sql, ext_sql = os.path.splitext(SQL_PATH)
+            base_relatorio, ext_relatorio = os.path.splitext(RELATORIO_CONFLITOS_PATH)
+            base_rejeitados, ext_rejeitados = os.path.splitext(REJEITADOS_PATH)
+            futuro = fila_atual.enfileirar(
+                processar_csv,
+                caminho,
+                sql_path=f"{base_sql}{sufixo}{ext_sql}",
+                relatorio_path=f"{base_relatorio}{sufixo}{ext_relatorio}",
+                opcoes=opcoes,
+                progresso=criar_progresso(caminho, fila_atual),
+                rejeitados_path=f"{base_rejeitados}{sufixo}{ext_rejeitados}"
+            )
+            futuro.add_done_callback(partial(concluir, caminho))
+
+    def cancelar(e):
+        if fila:
+            fila.cancelar()
+            output_text.value = "Cancelando..."
             page.update()
 
     def selecionar_arquivo(e):
-        file_picker.pick_files(allow_multiple=False)
+        if em_andamento:
+            return
+        file_picker.pick_files(allow_multiple=True, allowed_extensions=["csv"])
 
     def baixar_sql(e):
         if sql_path:
@@ -78,17 +1491,36 @@ WHERE Nro_rolo = '{row['NRO_ROLO']}' AND Nro_peca = '{row['NRO_PECA']}' AND Subl
 
     # Conecta eventos
     file_picker.on_result = on_file_selected
+    selecionar_button.on_click = selecionar_arquivo
     download_button.on_click = baixar_sql
+    cancel_button.on_click = cancelar
 
     sql_path = ""
 
     # Interface
     page.add(
         ft.Text("Gerador de UPDATEs para a tabela CTE_peca", size=22, weight="bold"),
-        ft.ElevatedButton("Selecionar CSV", icon=Icons.UPLOAD_FILE, on_click=selecionar_arquivo),
+        selecionar_button,
+        ft.Row([formato_dropdown, tamanho_lote_input], spacing=10),
+        banco_row,
+        streaming_switch,
+        ft.Row([paralelo_switch, workers_input], spacing=10),
+        deduplicar_switch,
+        incremental_switch,
+        ft.Row([compactar_switch, max_comandos_input, max_mb_input], spacing=10),
+        paralelismo_input,
+        ft.Row([progress_bar, cancel_button], spacing=10),
+        status_arquivos,
+        navegacao_row,
         sql_preview,
         output_text,
         download_button,
     )
 
-ft.app(target=main)
+if __name__ == "__main__":
+    # Uso: python gerador_sql_gui.py --benchmark arquivo.csv
+    if len(sys.argv) == 3 and sys.argv[1] == "--benchmark":
+        benchmark_paralelo(sys.argv[2])
+    else:
+        # A guarda evita que os processos filhos do modo paralelo abram outra janela
+        ft.app(target=main)
@@ -1,6 +1,16 @@
+import asyncio
 import flet as ft
-import requests
-from typing import Dict, Optional
+import httpx
+import cliente_http
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional
 import logging
 from functools import partial
 
@@ -20,15 +30,320 @@ class AppConfig:
     SERVER_HOST = "LOCALHOST"
     SERVER_PORT = 8500
     ASSETS_DIR = "assets"
+    UPLOAD_DIR = "uploads"  # Listas de pedidos enviadas pelo navegador (exige FLET_SECRET_KEY)
     CARD_HEIGHT = 300.0  # Altura fixa para os cards
     ROLOS_HEIGHT = 120.0  # Altura aumentada para o campo Rolos
+    POOL_MAX_CONEXOES = 20  # Conexões simultâneas com a API por processo
+    POOL_MAX_KEEPALIVE = 10  # Conexões ociosas mantidas abertas para reuso
+    POOL_KEEPALIVE_EXPIRY = 30.0  # Segundos até fechar uma conexão ociosa
+    TIMEOUT_CONEXAO = 5.0
+    TIMEOUT_LEITURA = 10.0
+    CACHE_TTL = 60.0  # Segundos até revalidar um pedido consultado
+    CACHE_MAX_ENTRADAS = 200
+    CACHE_MAX_BYTES = 8 * 1024 * 1024  # Limite de memória das respostas em cache
+    STORAGE_CHAVE = "oraculo.sugestao_rolos"  # Chave dos últimos resultados no client_storage
+    STORAGE_MAX_PEDIDOS = 10
+    STORAGE_MAX_BYTES = 200_000  # Limite do JSON salvo no dispositivo
+    CARDS_POR_PAGINA = 30  # Cards criados e enviados por vez
+    CARDS_MARGEM_ROLAGEM = 600.0  # Pixels antes do fim do grid para carregar a próxima página
+    CARDS_RETIDOS = 500  # Cards guardados para reuso quando somem da lista
+    MODO_COMPACTO = False  # Uma linha de texto por item em vez de cards
+    INTERVALO_ATUALIZACAO = 1 / 30  # Segundos entre envios de atualizações da página (um quadro)
+    LOG_ATUALIZACOES_A_CADA = 200  # Envios entre registros das estatísticas no log
+    RESIZE_ASSENTAMENTO = 0.25  # Segundos sem novos eventos de resize antes de recalcular o layout
+    INTERVALO_FILTRO_STREAMING = 0.25  # Segundos entre refiltragens enquanto o pedido chega com filtro ativo
+    STREAMING_RESULTADOS = True  # Exibe os cards conforme o corpo da resposta chega
+    LOTE_MAX_PEDIDOS = 200
+    LOTE_CONCORRENCIA = 8  # Pedidos do lote consultados ao mesmo tempo
+    LOTE_TIMEOUT = 15.0  # Segundos por pedido do lote
+    PREFETCH_PEDIDOS = False  # Pré-busca o pedido digitado antes do clique em Buscar
+    PREFETCH_ATRASO = 0.6  # Segundos sem digitar antes da pré-busca
+    PREFETCH_MIN_CARACTERES = 4
+    PREFETCH_MAX_DESPERDICIO = 30  # Pré-buscas não usadas permitidas por janela, no processo
+    PREFETCH_JANELA = 60.0  # Segundos da janela de desperdício
+    PUBSUB_PEDIDOS = True  # Repassa resultados novos às sessões que acompanham o mesmo pedido
 
-class ResponsiveCard(ft.Container):
+# Pool HTTP único do processo, compartilhado por todas as sessões
+cliente_http.configurar(
+    AppConfig.API_BASE,
+    max_conexoes=AppConfig.POOL_MAX_CONEXOES,
+    max_keepalive=AppConfig.POOL_MAX_KEEPALIVE,
+    keepalive_expiry=AppConfig.POOL_KEEPALIVE_EXPIRY,
+    timeout_conexao=AppConfig.TIMEOUT_CONEXAO,
+    timeout_leitura=AppConfig.TIMEOUT_LEITURA,
+    cache=cliente_http.CacheRespostas(
+        ttl=AppConfig.CACHE_TTL,
+        max_entradas=AppConfig.CACHE_MAX_ENTRADAS,
+        max_bytes=AppConfig.CACHE_MAX_BYTES,
+    ),
+)
+
+class AgendadorAtualizacao:
+    """Junta as atualizações de uma página e as envia no máximo uma vez por quadro.
+
+    Os handlers marcam controles (ou a página inteira) como alterados e um
+    único page.update() é feito ao fim do intervalo. Conta envios, controles
+    enviados e o tempo gasto em page.update(), que inclui serializar e enviar
+    os comandos ao cliente.
+    """
+
+    _por_pagina = weakref.WeakKeyDictionary()
+    _por_pagina_lock = threading.Lock()
+
+    @classmethod
+    def da_pagina(cls, page: ft.Page) -> "AgendadorAtualizacao":
+        with cls._por_pagina_lock:
+            agendador = cls._por_pagina.get(page)
+            if agendador is None:
+                agendador = cls._por_pagina[page] = cls(page)
+            return agendador
+
+    def __init__(self, page: ft.Page, intervalo: float = AppConfig.INTERVALO_ATUALIZACAO):
+        self.page = page
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._sujos: Dict[int, ft.Control] = {}
+        self._pagina_toda = False
+        self._agendado = False
+        self.marcacoes = 0
+        self.descargas = 0
+        self.controles_enviados = 0
+        self.paginas_inteiras = 0
+        self.segundos_enviando = 0.0
+
+    def marcar(self, *controles: ft.Control):
+        """Agenda o envio dos controles; sem argumentos, da página inteira"""
+        with self._lock:
+            self.marcacoes += 1
+            if not controles:
+                self._pagina_toda = True
+            for controle in controles:
+                self._sujos[id(controle)] = controle
+            if self._agendado:
+                return
+            self._agendado = True
+        self.page.run_task(self._descarregar_apos_intervalo)
+
+    async def _descarregar_apos_intervalo(self):
+        await asyncio.sleep(self.intervalo)
+        self.descarregar()
+
+    def descarregar(self):
+        """Envia agora tudo o que foi marcado"""
+        with self._lock:
+            controles = list(self._sujos.values())
+            pagina_toda = self._pagina_toda
+            self._sujos.clear()
+            self._pagina_toda = False
+            self._agendado = False
+        if not controles and not pagina_toda:
+            return
+        try:
+            inicio = time.perf_counter()
+            if pagina_toda:
+                self.page.update()
+            else:
+                self.page.update(*controles)
+            self.segundos_enviando += time.perf_counter() - inicio
+            self.descargas += 1
+            self.controles_enviados += 1 if pagina_toda else len(controles)
+            self.paginas_inteiras += pagina_toda
+            if self.descargas % AppConfig.LOG_ATUALIZACOES_A_CADA == 0:
+                logger.info(f"Atualizações da página: {self.estatisticas()}")
+        except Exception as e:
+            logger.error(f"Erro ao enviar atualizações: {str(e)}")
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores dos envios.
+
+        ``controles_enviados`` conta as raízes passadas a page.update(), não o
+        tamanho do que vai ao cliente: o Flet só envia as propriedades que
+        mudaram em cada subárvore, e esse volume não é exposto. Como
+        aproximação, ``paginas_inteiras`` conta os envios da página toda, que
+        comparam todos os controles, e ``ms_enviando`` mede o custo de fato.
+        """
+        return {
+            "marcacoes": self.marcacoes,
+            "descargas": self.descargas,
+            "controles_enviados": self.controles_enviados,
+            "paginas_inteiras": self.paginas_inteiras,
+            "ms_enviando": round(self.segundos_enviando * 1000),
+        }
+
+def ler_lista_pedidos(texto: str) -> List[str]:
+    """Extrai os pedidos de um texto colado ou arquivo (linhas, vírgulas, espaços)"""
+    pedidos = []
+    for token in re.split(r"[\s,;]+", texto or ""):
+        token = token.strip().strip('"')
+        # Ignora cabeçalhos e palavras soltas
+        if token and any(ch.isdigit() for ch in token):
+            pedidos.append(token)
+    return list(dict.fromkeys(pedidos))[:AppConfig.LOTE_MAX_PEDIDOS]
+
+def converter_numero(valor) -> Optional[float]:
+    """Converte valores da API como "10,5" em float; None se não for numérico"""
+    try:
+        return float(str(valor).strip().replace(",", "."))
+    except ValueError:
+        return None
+
+def somar_campo(dados: list, campo: str) -> float:
+    """Soma um campo numérico dos itens, ignorando valores não numéricos"""
+    total = 0.0
+    for item in dados:
+        numero = converter_numero(item.get(campo, 0)) if isinstance(item, dict) else None
+        if numero is not None:
+            total += numero
+    return total
+
+class IndiceResultados:
+    """Índices em memória sobre os itens de um pedido, para filtrar e ordenar sem a API.
+
+    Para cada campo de filtro guarda os valores normalizados em ordem, o que
+    permite achar por busca binária todos os itens com um prefixo. As ordens
+    de classificação são calculadas na primeira vez em que são pedidas.
+    """
+
+    CAMPOS = {
+        "Produto": ("Produto",),
+        "Cor": ("Cor",),
+        "SubLote": ("Sublote", "SubLote"),
+        "Gavetas": ("Gavetas",),
+    }
+    NUMERICOS = ("Total_Metros", "Qtde_Saldo")
+
+    def __init__(self, itens: List[Dict]):
+        self.itens = itens
+        self._valores: Dict[str, List[str]] = {}
+        self._posicoes: Dict[str, List[int]] = {}
+        for campo, nomes in self.CAMPOS.items():
+            pares = sorted((self._texto(item, nomes), i) for i, item in enumerate(itens))
+            self._valores[campo] = [valor for valor, _ in pares]
+            self._posicoes[campo] = [i for _, i in pares]
+        self._ordens: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def _texto(item: Dict, nomes: tuple) -> str:
+        for nome in nomes:
+            if nome in item:
+                return str(item[nome]).strip().casefold()
+        return ""
+
+    def buscar(self, campo: str, prefixo: str) -> List[int]:
+        """Posições dos itens cujo campo começa com o prefixo"""
+        valores = self._valores[campo]
+        inicio = bisect_left(valores, prefixo)
+        fim = bisect_left(valores, prefixo + "\U0010ffff", inicio)
+        return self._posicoes[campo][inicio:fim]
+
+    def ordem(self, campo: str) -> List[int]:
+        """Posições dos itens ordenadas pelo campo (numéricos do menor ao maior)"""
+        if campo not in self._ordens:
+            if campo in self.NUMERICOS:
+                numeros = [converter_numero(item.get(campo)) for item in self.itens]
+                chave = lambda i: (numeros[i] is not None, numeros[i] or 0.0)
+            else:
+                nomes = self.CAMPOS.get(campo, (campo,))
+                textos = [self._texto(item, nomes) for item in self.itens]
+                chave = lambda i: textos[i]
+            self._ordens[campo] = sorted(range(len(self.itens)), key=chave)
+        return self._ordens[campo]
+
+    def filtrar(
+        self,
+        campo: str,
+        prefixo: str,
+        ordenar_por: Optional[str] = None,
+        decrescente: bool = False,
+    ) -> List[Dict]:
+        """Itens com o prefixo no campo (ou em qualquer campo, com "Todos"), na ordem pedida"""
+        prefixo = prefixo.strip().casefold()
+        selecionados = None
+        if prefixo:
+            campos = self.CAMPOS if campo not in self.CAMPOS else (campo,)
+            selecionados = set()
+            for nome in campos:
+                selecionados.update(self.buscar(nome, prefixo))
+        if ordenar_por:
+            ordem = self.ordem(ordenar_por)
+            if decrescente:
+                ordem = reversed(ordem)
+        else:
+            ordem = range(len(self.itens))
+        return [self.itens[i] for i in ordem if selecionados is None or i in selecionados]
+
+class LimitePrefetch:
+    """Conta as pré-buscas desperdiçadas no processo numa janela deslizante.
+
+    Pré-buscas que chegaram à API mas não foram usadas consomem o limite de
+    requisições do servidor; passado o teto, novas pré-buscas ficam suspensas
+    até a janela esvaziar. As buscas pelo botão nunca são limitadas.
+    """
+
+    def __init__(self, maximo: int, janela: float):
+        self.maximo = maximo
+        self.janela = janela
+        self._desperdicios = deque()
+        self._lock = threading.Lock()
+        self.aproveitadas = 0
+
+    def _expirar(self, agora: float):
+        while self._desperdicios and self._desperdicios[0] <= agora - self.janela:
+            self._desperdicios.popleft()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            self._expirar(time.monotonic())
+            return len(self._desperdicios) < self.maximo
+
+    def registrar_desperdicio(self):
+        with self._lock:
+            self._desperdicios.append(time.monotonic())
+
+    def registrar_aproveitamento(self):
+        with self._lock:
+            self.aproveitadas += 1
+            resumo = f"aproveitadas={self.aproveitadas} desperdiçadas na janela={len(self._desperdicios)}"
+        logger.info(f"Pré-busca aproveitada ({resumo})")
+
+limite_prefetch = LimitePrefetch(AppConfig.PREFETCH_MAX_DESPERDICIO, AppConfig.PREFETCH_JANELA)
+
+class DadosItem:
+    """Acesso aos campos de um item da sugestão, comum ao card e à linha compacta"""
+
+    item_data: Dict
+
+    def _campos(self) -> list:
+        """Rótulos e valores exibidos para o item"""
+        return [
+            ("Produto", self._get_data('Produto')),
+            ("Cor", self._get_data('Cor')),
+            ("Qtde Item", self._get_data('Qtde_Item')),
+            ("Qtde Saldo", self._get_data('Qtde_Saldo')),
+            ("SubLote", self._get_data('Sublote', self._get_data('SubLote', '---'))),
+            ("Gavetas", self._get_data('Gavetas')),
+            ("Qtde Peças", self._get_data('Qtde_Pecas')),
+            ("Total Metros", self._get_data('Total_Metros')),
+        ]
+
+    @staticmethod
+    def chave(item_data: Dict) -> tuple:
+        """Identidade estável do item entre atualizações: Produto + Cor + SubLote"""
+        sublote = item_data.get('Sublote', item_data.get('SubLote'))
+        return (str(item_data.get('Produto')), str(item_data.get('Cor')), str(sublote))
+
+    def _get_data(self, key: str, default: str = "") -> str:
+        """Método seguro para obter dados do item"""
+        return str(self.item_data.get(key, default)).strip()
+
+class ResponsiveCard(DadosItem, ft.Container):
     """Componente de card responsivo com altura fixa e rolagem no campo Rolos"""
     
     def __init__(self, item_data: Dict, page: ft.Page):
         self.page = page
         self.item_data = item_data or {}
+        self._textos: List[ft.Text] = []
+        self._texto_rolos: Optional[ft.Text] = None
         super().__init__(
             padding=12,
             bgcolor=ft.Colors.SURFACE,
@@ -65,21 +380,16 @@ class ResponsiveCard(ft.Container):
     def _build_content(self) -> ft.Column:
         """Constrói conteúdo do card com rolagem no campo Rolos"""
         try:
-            fields = [
-                ("Produto", self._get_data('Produto')),
-                ("Cor", self._get_data('Cor')),
-                ("Qtde Item", self._get_data('Qtde_Item')),
-                ("Qtde Saldo", self._get_data('Qtde_Saldo')),
-                ("SubLote", self._get_data('Sublote', self._get_data('SubLote', '---'))),
-                ("Gavetas", self._get_data('Gavetas')),
-                ("Qtde Peças", self._get_data('Qtde_Pecas')),
-                ("Total Metros", self._get_data('Total_Metros')),
+            self._textos = [
+                ft.Text(f"{label}: {value}", 
+                       weight=ft.FontWeight.BOLD if idx == 0 else None)
+                for idx, (label, value) in enumerate(self._campos())
             ]
             
             # Campo Rolos com rolagem interna usando ListView
-            rolos_content = self._get_data('Rolos')
+            self._texto_rolos = ft.Text(self._get_data('Rolos'), selectable=True)
             rolos_container = ft.ListView(
-                controls=[ft.Text(rolos_content, selectable=True)],
+                controls=[self._texto_rolos],
                 height=AppConfig.ROLOS_HEIGHT,  # Altura aumentada para melhor interação
                 auto_scroll=True,  # Melhora rolagem em dispositivos móveis
                 padding=5,
@@ -87,11 +397,7 @@ class ResponsiveCard(ft.Container):
             )
             
             return ft.Column(
-                controls=[
-                    ft.Text(f"{label}: {value}", 
-                           weight=ft.FontWeight.BOLD if idx == 0 else None)
-                    for idx, (label, value) in enumerate(fields)
-                ] + [
+                controls=self._textos + [
                     ft.Text("Rolos:", weight=ft.FontWeight.BOLD),
                     ft.Container(
                         content=rolos_container,
@@ -108,22 +414,224 @@ class ResponsiveCard(ft.Container):
             logger.error(f"Erro ao construir card: {str(e)}")
             return ft.Column(controls=[ft.Text("Erro ao carregar dados")])
 
-    def _get_data(self, key: str, default: str = "") -> str:
-        """Método seguro para obter dados do item"""
-        return str(self.item_data.get(key, default)).strip()
+    def atualizar(self, item_data: Dict) -> bool:
+        """Troca os dados do card alterando só os textos que mudaram"""
+        self.item_data = item_data or {}
+        mudou = False
+        for texto, (label, value) in zip(self._textos, self._campos()):
+            novo = f"{label}: {value}"
+            if texto.value != novo:
+                texto.value = novo
+                mudou = True
+        rolos = self._get_data('Rolos')
+        if self._texto_rolos is not None and self._texto_rolos.value != rolos:
+            self._texto_rolos.value = rolos
+            mudou = True
+        return mudou
+
+    def ajustar_largura(self) -> bool:
+        """Recalcula a largura para a janela atual; retorna se mudou"""
+        largura = self._calculate_safe_width()
+        if largura == self.width:
+            return False
+        self.width = largura
+        return True
 
     def _on_card_hover(self, e: ft.ControlEvent):
         """Efeito hover no card"""
         self.bgcolor = ft.Colors.SURFACE if not e.data == "true" else ft.Colors.SECONDARY_CONTAINER
-        self.update()
+        AgendadorAtualizacao.da_pagina(self.page).marcar(self)
+
+class LinhaCompacta(DadosItem, ft.Text):
+    """Item em uma única linha de texto, para o modo compacto em aparelhos modestos"""
+
+    def __init__(self, item_data: Dict, page: ft.Page):
+        self.item_data = item_data or {}
+        super().__init__(value=self._formatar(), size=12, selectable=True)
+
+    def _formatar(self) -> str:
+        partes = [f"{label}: {value}" for label, value in self._campos()]
+        partes.append(f"Rolos: {self._get_data('Rolos')}")
+        return " | ".join(partes)
+
+    def atualizar(self, item_data: Dict) -> bool:
+        """Troca os dados da linha; retorna se o texto mudou"""
+        self.item_data = item_data or {}
+        novo = self._formatar()
+        if novo == self.value:
+            return False
+        self.value = novo
+        return True
+
+class GerenciadorLayout:
+    """Layout responsivo da SugestaoRolosView com resize amortecido.
+
+    Cada evento de resize só adia o prazo; o layout é recalculado uma vez,
+    quando a janela fica RESIZE_ASSENTAMENTO segundos sem mudar, e só as
+    propriedades que mudaram (alturas, colunas e larguras dos cards) são
+    alteradas nos controles existentes.
+    """
+
+    def __init__(self, view: "SugestaoRolosView", intervalo: float = AppConfig.RESIZE_ASSENTAMENTO):
+        self.view = view
+        self.intervalo = intervalo
+        self._prazo = 0.0
+        self._tarefa: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def colunas(page: ft.Page) -> int:
+        largura = page.window.width
+        return 1 if largura and largura < AppConfig.MOBILE_BREAKPOINT else 3
+
+    @staticmethod
+    def altura_painel(page: ft.Page) -> float:
+        return page.window.height * 0.7 if page.window.height else 500
+
+    async def on_resized(self, e: ft.WindowResizeEvent):
+        self._prazo = time.monotonic() + self.intervalo
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._aguardar_assentamento())
+
+    async def _aguardar_assentamento(self):
+        try:
+            while (restante := self._prazo - time.monotonic()) > 0:
+                await asyncio.sleep(restante)
+            self.aplicar()
+        except Exception as e:
+            logger.error(f"Erro ao redimensionar: {str(e)}")
+
+    def aplicar(self):
+        """Ajusta alturas, colunas do grid e larguras dos cards à janela atual"""
+        view = self.view
+        alterados = []
+
+        altura = self.altura_painel(view.page)
+        if view.painel_resultado.height != altura:
+            view.painel_resultado.height = altura
+            view.container_resultado.height = altura
+            alterados.append(view.container_resultado)
+
+        grid = view._grid
+        if isinstance(grid, ft.GridView):
+            colunas = self.colunas(view.page)
+            mudou = grid.runs_count != colunas
+            grid.runs_count = colunas
+            for card in grid.controls:
+                if isinstance(card, ResponsiveCard) and card.ajustar_largura():
+                    mudou = True
+            if mudou:
+                alterados.append(grid)
+
+        if alterados:
+            view._atualizacoes.marcar(*alterados)
+
+class HistoricoPedidos:
+    """Últimos resultados de pedidos salvos no client_storage do dispositivo.
+
+    Cada pedido é guardado em forma colunar (nomes das colunas uma vez e as
+    linhas como listas), do mais antigo para o mais recente. Os mais antigos
+    são descartados ao passar de STORAGE_MAX_PEDIDOS ou STORAGE_MAX_BYTES;
+    um resultado que sozinho passa de STORAGE_MAX_BYTES não é salvo.
+    """
+
+    def __init__(self, page: ft.Page):
+        self.page = page
+        self._entradas: Optional[List[Dict]] = None
+
+    async def _carregar(self) -> List[Dict]:
+        if self._entradas is None:
+            try:
+                salvo = await self.page.client_storage.get_async(AppConfig.STORAGE_CHAVE)
+                self._entradas = list(salvo) if isinstance(salvo, list) else []
+            except Exception as e:
+                logger.error(f"Erro ao ler histórico local: {str(e)}")
+                self._entradas = []
+        return self._entradas
+
+    @staticmethod
+    def _compactar(dados: list) -> Dict:
+        itens = [item for item in dados if isinstance(item, dict)]
+        colunas = list(dict.fromkeys(chave for item in itens for chave in item))
+        return {"c": colunas, "l": [[item.get(col) for col in colunas] for item in itens]}
+
+    @staticmethod
+    def _expandir(entrada: Dict) -> list:
+        colunas = entrada.get("c", [])
+        return [
+            {col: valor for col, valor in zip(colunas, linha) if valor is not None}
+            for linha in entrada.get("l", [])
+        ]
+
+    async def ultimo_pedido(self) -> Optional[str]:
+        entradas = await self._carregar()
+        return entradas[-1]["p"] if entradas else None
+
+    async def carregar(self, pedido: str) -> Optional[Dict]:
+        """Retorna {"dados", "salvo_em"} do pedido, se houver"""
+        for entrada in await self._carregar():
+            if entrada.get("p") == pedido:
+                return {"dados": self._expandir(entrada), "salvo_em": entrada.get("t", 0)}
+        return None
+
+    async def salvar(self, pedido: str, dados: list):
+        """Guarda o resultado como o mais recente e aplica os limites"""
+        try:
+            nova = {"p": pedido, "t": time.time(), **self._compactar(dados)}
+            if len(json.dumps([nova], separators=(",", ":"))) > AppConfig.STORAGE_MAX_BYTES:
+                # Salvar apagaria todo o histórico e ainda não caberia
+                logger.info(f"Pedido {pedido} grande demais para o histórico local; mantidos os anteriores")
+                return
+            entradas = [e for e in await self._carregar() if e.get("p") != pedido]
+            entradas.append(nova)
+            entradas = entradas[-AppConfig.STORAGE_MAX_PEDIDOS:]
+            while len(entradas) > 1 and len(json.dumps(entradas, separators=(",", ":"))) > AppConfig.STORAGE_MAX_BYTES:
+                entradas.pop(0)
+            self._entradas = entradas
+            await self.page.client_storage.set_async(AppConfig.STORAGE_CHAVE, entradas)
+        except Exception as e:
+            logger.error(f"Erro ao salvar histórico local: {str(e)}")
+
+# Opções de ordenação: chave -> (rótulo, campo, decrescente)
+ORDENACOES = {
+    "original": ("Ordem original", None, False),
+    "metros": ("Total Metros (maior)", "Total_Metros", True),
+    "saldo": ("Qtde Saldo (maior)", "Qtde_Saldo", True),
+    "produto": ("Produto (A-Z)", "Produto", False),
+}
 
 class SugestaoRolosView:
     """View de sugestão de rolos com rolagem corrigida"""
     
     def __init__(self, page: ft.Page):
         self.page = page
+        self._tarefa_busca: Optional[asyncio.Task] = None
+        self._tarefa_lote: Optional[asyncio.Task] = None
+        self._topico: Optional[str] = None
+        self._dados_exibidos: Optional[list] = None
+        self._exibindo_salvos = False
+        self._historico = HistoricoPedidos(page)
+        self._atualizacoes = AgendadorAtualizacao.da_pagina(page)
+        self._layout = GerenciadorLayout(self)
+        self._grid: Optional[ft.GridView] = None
+        self._itens: List[Dict] = []
+        self._chaves_itens: List[tuple] = []
+        self._cards: Dict[tuple, ResponsiveCard] = {}
+        self._pedido_atual: Optional[str] = None
+        self._pedido_grid: Optional[str] = None
+        self._salvo_em: Optional[float] = None
+        self._ocorrencias: Dict[tuple, int] = {}
+        self._itens_todos: List[Dict] = []
+        self._indice: Optional[IndiceResultados] = None
+        self._linhas_lote: Dict[str, tuple] = {}  # pedido -> (status, botão abrir)
+        self._resumo_lote = ""
+        self._prazo_prefetch = 0.0
+        self._tarefa_digitacao: Optional[asyncio.Task] = None
+        self._tarefa_prefetch: Optional[asyncio.Task] = None
+        self._prefetch_pendente: Optional[str] = None  # Pré-buscado e ainda não usado
+        self._refiltro_agendado = False
         self._setup_ui()
         self._setup_event_handlers()
+        self.page.run_task(self._restaurar_ultimo_pedido)
 
     def _setup_ui(self):
         """Configura componentes UI com rolagem adequada"""
@@ -134,6 +642,21 @@ class SugestaoRolosView:
             value=""
         )
         
+        self.lote_input = ft.TextField(
+            label="Lote de pedidos",
+            hint_text="Cole vários pedidos separados por linha, vírgula ou espaço",
+            multiline=True,
+            min_lines=1,
+            max_lines=4,
+            width=300,
+        )
+        
+        self.seletor_lote = ft.FilePicker(
+            on_result=self._on_arquivo_lote,
+            on_upload=self._on_upload_lote
+        )
+        self.page.overlay.append(self.seletor_lote)
+        
         self.resultado_info = ft.Text()
         
         self.lista_resultados = ft.ListView(
@@ -143,6 +666,49 @@ class SugestaoRolosView:
             auto_scroll=False
         )
         
+        self.campo_filtro = ft.Dropdown(
+            label="Filtrar por",
+            width=140,
+            value="Todos",
+            options=[ft.dropdown.Option(campo) for campo in ("Todos", *IndiceResultados.CAMPOS)],
+            on_change=self._on_filtrar
+        )
+        
+        self.filtro_input = ft.TextField(
+            label="Começa com",
+            width=200,
+            on_change=self._on_filtrar
+        )
+        
+        self.ordenar_dropdown = ft.Dropdown(
+            label="Ordenar",
+            width=200,
+            value="original",
+            options=[ft.dropdown.Option(chave, texto) for chave, (texto, _, _) in ORDENACOES.items()],
+            on_change=self._on_filtrar
+        )
+        
+        self.modo_compacto = ft.Switch(
+            label="Modo compacto",
+            value=AppConfig.MODO_COMPACTO,
+            on_change=self._on_modo_compacto
+        )
+        
+        self.botao_mais = ft.TextButton(
+            "⬇ Mostrar mais",
+            visible=False,
+            on_click=self._on_mostrar_mais
+        )
+        
+        # Status por pedido do último lote; fica oculto enquanto um pedido dele é exibido
+        self.painel_lote = ft.Column(spacing=10)
+        
+        self.botao_voltar_lote = ft.TextButton(
+            "⬅ Voltar ao lote",
+            visible=False,
+            on_click=self._on_voltar_lote
+        )
+        
         self.painel_resultado = ft.Container(
             content=self.lista_resultados,
             visible=False,
@@ -151,75 +717,554 @@ class SugestaoRolosView:
             border_radius=10,
             padding=10,
         )
+        
+        self.container_resultado = ft.Container(
+            content=self.painel_resultado,
+            expand=True,
+            height=GerenciadorLayout.altura_painel(self.page)
+        )
 
     def _setup_event_handlers(self):
         """Configura handlers de eventos"""
         self.buscar_handler = partial(self._buscar_pedido)
         self.pdf_handler = partial(self._abrir_pdf)
-        self.page.on_resize = self._on_resize
+        self.lote_handler = partial(self._buscar_lote)
+        self.pedido_input.on_change = self._on_pedido_digitado
+        self.page.on_resized = self._layout.on_resized
 
-    def _on_resize(self, e: ft.ControlEvent):
-        """Atualiza dimensões do painel ao redimensionar"""
+    async def _restaurar_ultimo_pedido(self):
+        """Reabre o último pedido consultado neste dispositivo"""
         try:
-            self.painel_resultado.height = self.page.window.height * 0.7 if self.page.window.height else 500
-            self.page.update()
+            pedido = await self._historico.ultimo_pedido()
+            if pedido and not self.pedido_input.value:
+                self.pedido_input.value = pedido
+                self._atualizacoes.marcar(self.pedido_input)
+                await self._buscar_pedido(None)
         except Exception as e:
-            logger.error(f"Erro ao redimensionar: {str(e)}")
+            logger.error(f"Erro ao restaurar último pedido: {str(e)}")
 
-    def _buscar_pedido(self, e: ft.ControlEvent):
-        """Busca dados do pedido na API"""
+    async def _buscar_pedido(self, e: ft.ControlEvent):
+        """Dispara a busca do pedido sem bloquear a sessão, cancelando a busca anterior"""
         try:
             pedido = self.pedido_input.value.strip()
             if not pedido:
                 self._update_ui("❗ Informe o número do pedido.", False)
                 return
 
-            self._update_ui("🔍 Buscando dados...", False)
-            
-            response = requests.get(
-                f"{AppConfig.API_BASE}/sugestao-rolos/{pedido}",
-                timeout=10
+            # Só a consulta mais recente pode renderizar resultados
+            if self._tarefa_busca and not self._tarefa_busca.done():
+                self._tarefa_busca.cancel()
+
+            if pedido == self._prefetch_pendente:
+                self._prefetch_pendente = None
+                limite_prefetch.registrar_aproveitamento()
+            else:
+                self._descartar_prefetch()
+
+            self._acompanhar_pedido(pedido)
+            self._pedido_atual = pedido
+            # Ao repetir o pedido exibido, os cards ficam na tela até a atualização chegar
+            self._update_ui(
+                "🔍 Buscando dados...",
+                pedido == self._pedido_grid and self.painel_resultado.visible
             )
-            response.raise_for_status()
+            self._tarefa_busca = asyncio.create_task(self._consultar_pedido(pedido))
+
+        except Exception as e:
+            self._update_ui(f"❌ Erro inesperado: {str(e)}", False)
+
+    async def _on_pedido_digitado(self, e: ft.ControlEvent):
+        """Adia a pré-busca até o usuário parar de digitar"""
+        if not AppConfig.PREFETCH_PEDIDOS:
+            return
+        self._prazo_prefetch = time.monotonic() + AppConfig.PREFETCH_ATRASO
+        if self._tarefa_digitacao is None or self._tarefa_digitacao.done():
+            self._tarefa_digitacao = asyncio.create_task(self._aguardar_digitacao())
+
+    async def _aguardar_digitacao(self):
+        try:
+            while (restante := self._prazo_prefetch - time.monotonic()) > 0:
+                await asyncio.sleep(restante)
+            pedido = (self.pedido_input.value or "").strip()
+            if len(pedido) < AppConfig.PREFETCH_MIN_CARACTERES or pedido == self._prefetch_pendente:
+                return
+            pool = cliente_http.obter_pool()
+            entrada = pool.cache.consultar(f"/sugestao-rolos/{pedido}") if pool.cache else None
+            if entrada is not None and entrada.expira_em > time.monotonic():
+                return  # Já está quente
+            if not limite_prefetch.permitir():
+                logger.info(f"Pré-busca do pedido {pedido} suspensa: limite de desperdício atingido")
+                return
+            self._descartar_prefetch()
+            self._prefetch_pendente = pedido
+            # Não é aguardada: a digitação seguinte pode agendar outra pré-busca
+            self._tarefa_prefetch = asyncio.create_task(self._pre_buscar(pedido))
+        except Exception as e:
+            logger.error(f"Erro ao agendar pré-busca: {str(e)}")
+
+    def _descartar_prefetch(self):
+        """Conta a pré-busca ainda não usada como desperdiçada"""
+        if self._prefetch_pendente is not None:
+            self._prefetch_pendente = None
+            limite_prefetch.registrar_desperdicio()
+
+    def encerrar(self):
+        """Chamado quando a view sai da tela"""
+        self._descartar_prefetch()
+
+    async def _pre_buscar(self, pedido: str):
+        """Aquece o cache com o pedido digitado, sem exibir nada"""
+        try:
+            await cliente_http.obter_pool().get_json_async(f"/sugestao-rolos/{pedido}")
+        except Exception as e:
+            logger.info(f"Pré-busca do pedido {pedido} falhou: {str(e)}")
+
+    async def _buscar_lote(self, e: ft.ControlEvent):
+        """Consulta vários pedidos de uma vez, exibindo o status de cada um"""
+        try:
+            pedidos = ler_lista_pedidos(self.lote_input.value)
+            if not pedidos:
+                self._update_ui("❗ Informe ao menos um pedido no lote.", False)
+                return
+
+            for tarefa in (self._tarefa_busca, self._tarefa_lote):
+                if tarefa and not tarefa.done():
+                    tarefa.cancel()
+            if self._topico:
+                self.page.pubsub.unsubscribe_topic(self._topico)
+                self._topico = None
+
+            self._pedido_atual = None
+            self._montar_painel_lote(pedidos)
+            self._informar_lote(f"🔍 Buscando {len(pedidos)} pedidos...")
+            self._tarefa_lote = asyncio.create_task(self._consultar_lote(pedidos))
 
-            dados = response.json() or []
-            self._exibir_resultados(dados)
-            
-        except requests.exceptions.RequestException as e:
-            self._update_ui(f"⚠️ Erro na conexão: {str(e)}", False)
         except Exception as e:
             self._update_ui(f"❌ Erro inesperado: {str(e)}", False)
 
-    def _exibir_resultados(self, dados: list):
-        """Exibe os resultados na UI com rolagem adequada"""
+    def _montar_painel_lote(self, pedidos: List[str]):
+        """Uma linha por pedido do lote, com status e botão para abrir os cards"""
+        self.lista_resultados.controls = [self.painel_lote]
+        self.painel_lote.controls.clear()
+        self.painel_lote.visible = True
+        self.botao_voltar_lote.visible = False
+        self._grid = None
+        self._pedido_grid = None
+        self._dados_exibidos = None
+        self._linhas_lote = {}
+        for pedido in pedidos:
+            status = ft.Text("⏳ Aguardando", size=12, expand=True)
+            abrir = ft.TextButton(
+                "Abrir",
+                disabled=True,
+                on_click=partial(self._abrir_pedido_do_lote, pedido)
+            )
+            self._linhas_lote[pedido] = (status, abrir)
+            self.painel_lote.controls.append(
+                ft.Row(
+                    controls=[ft.Text(pedido, weight=ft.FontWeight.BOLD, width=110), status, abrir],
+                    spacing=10
+                )
+            )
+
+    async def _consultar_lote(self, pedidos: List[str]):
+        """Busca os pedidos em paralelo, até LOTE_CONCORRENCIA por vez"""
+        pool = cliente_http.obter_pool()
+        limite = asyncio.Semaphore(AppConfig.LOTE_CONCORRENCIA)
+        inicio = time.monotonic()
+        concluidos = 0
+        erros = 0
+
+        async def consultar(pedido: str):
+            nonlocal concluidos, erros
+            status, abrir = self._linhas_lote[pedido]
+            async with limite:
+                status.value = "🔍 Buscando..."
+                self._atualizacoes.marcar(status)
+                try:
+                    dados = await asyncio.wait_for(
+                        pool.get_json_async(f"/sugestao-rolos/{pedido}"),
+                        AppConfig.LOTE_TIMEOUT
+                    ) or []
+                    itens = [item for item in dados if isinstance(item, dict)]
+                    status.value = (
+                        f"✅ {len(itens)} itens | "
+                        f"{somar_campo(itens, 'Total_Metros'):.2f} m | "
+                        f"{somar_campo(itens, 'Qtde_Pecas'):.0f} peças"
+                    )
+                    abrir.disabled = False
+                except asyncio.TimeoutError:
+                    erros += 1
+                    status.value = f"⏱ Sem resposta em {AppConfig.LOTE_TIMEOUT:.0f}s"
+                except httpx.HTTPError as e:
+                    erros += 1
+                    status.value = f"⚠️ Erro na conexão: {str(e)}"
+                except Exception as e:
+                    erros += 1
+                    status.value = f"❌ Erro inesperado: {str(e)}"
+            concluidos += 1
+            self._informar_lote(f"🔍 {concluidos}/{len(pedidos)} pedidos consultados...")
+
+        try:
+            await asyncio.gather(*(consultar(pedido) for pedido in pedidos))
+            duracao = time.monotonic() - inicio
+            self._informar_lote(
+                f"✅ {len(pedidos)} pedidos consultados em {duracao:.1f}s ({erros} com erro)"
+            )
+        except asyncio.CancelledError:
+            logger.info("Busca em lote cancelada por uma nova consulta")
+            raise
+
+    async def _abrir_pedido_do_lote(self, pedido: str, e: ft.ControlEvent):
+        """Exibe os cards de um pedido do lote (já em cache) sem interromper o lote"""
+        self.pedido_input.value = pedido
+        self._atualizacoes.marcar(self.pedido_input)
+        await self._buscar_pedido(e)
+
+    def _informar_lote(self, mensagem: str):
+        """Mostra o andamento do lote na mensagem ou, com um pedido aberto, no botão de voltar"""
+        self._resumo_lote = mensagem
+        if self.painel_lote.visible:
+            self._update_ui(mensagem, True)
+        else:
+            self.botao_voltar_lote.text = f"⬅ Voltar ao lote ({mensagem})"
+            self._atualizacoes.marcar(self.botao_voltar_lote)
+
+    async def _on_voltar_lote(self, e: ft.ControlEvent):
+        """Volta do pedido aberto para o status de todos os pedidos do lote"""
+        try:
+            if self._tarefa_busca and not self._tarefa_busca.done():
+                self._tarefa_busca.cancel()
+            if self._topico:
+                self.page.pubsub.unsubscribe_topic(self._topico)
+                self._topico = None
+            self._pedido_atual = None
+            self._grid = None
+            self._pedido_grid = None
+            self._dados_exibidos = None
+            self.painel_lote.visible = True
+            self.botao_voltar_lote.visible = False
+            self.lista_resultados.controls = [self.painel_lote]
+            self._update_ui(self._resumo_lote, True)
+        except Exception as e:
+            logger.error(f"Erro ao voltar ao lote: {str(e)}")
+
+    def _on_arquivo_lote(self, e: ft.FilePickerResultEvent):
+        """Lê a lista de pedidos do arquivo escolhido (no navegador, envia antes)"""
+        try:
+            if not e.files:
+                return
+            arquivo = e.files[0]
+            if arquivo.path:
+                self._carregar_lista_pedidos(arquivo.path)
+            else:
+                self.seletor_lote.upload([
+                    ft.FilePickerUploadFile(
+                        arquivo.name,
+                        upload_url=self.page.get_upload_url(arquivo.name, 60)
+                    )
+                ])
+        except Exception as e:
+            logger.error(f"Erro ao carregar arquivo de pedidos: {str(e)}")
+
+    def _on_upload_lote(self, e: ft.FilePickerUploadEvent):
+        try:
+            if e.error:
+                self._update_ui(f"⚠️ Erro ao enviar arquivo: {e.error}", False)
+            elif e.progress == 1:
+                self._carregar_lista_pedidos(os.path.join(AppConfig.UPLOAD_DIR, e.file_name))
+        except Exception as e:
+            logger.error(f"Erro ao receber arquivo de pedidos: {str(e)}")
+
+    def _carregar_lista_pedidos(self, caminho: str):
+        with open(caminho, encoding="utf-8", errors="replace") as arquivo:
+            pedidos = ler_lista_pedidos(arquivo.read())
+        self.lote_input.value = "\n".join(pedidos)
+        self._atualizacoes.marcar(self.lote_input)
+        self._update_ui(f"📋 {len(pedidos)} pedidos carregados do arquivo", self.painel_resultado.visible)
+
+    async def _consultar_pedido(self, pedido: str):
+        """Exibe o resultado salvo do pedido, se houver, e o revalida na API"""
+        try:
+            self._exibindo_salvos = False
+            salvo = await self._historico.carregar(pedido)
+            if salvo:
+                self._exibir_resultados(salvo["dados"], salvo_em=salvo["salvo_em"])
+
+            pool = cliente_http.obter_pool()
+            ao_atualizar = partial(self._publicar_pedido, self._topico) if self._topico else None
+            # Progressivo só quando o pedido ainda não está na tela (nem salvo)
+            ao_receber_lote = (
+                partial(self._receber_lote, pedido)
+                if AppConfig.STREAMING_RESULTADOS and self._pedido_grid != pedido
+                else None
+            )
+            dados = await pool.get_json_async(
+                f"/sugestao-rolos/{pedido}", ao_atualizar, ao_receber_lote
+            ) or []
+            logger.debug(f"Pool HTTP: {pool.estatisticas()}")
+
+            self._exibir_resultados(dados)
+            await self._historico.salvar(pedido, dados)
+
+        except asyncio.CancelledError:
+            logger.info(f"Busca do pedido {pedido} cancelada por uma nova consulta")
+            raise
+        except httpx.HTTPError as e:
+            self._update_ui(f"⚠️ Erro na conexão: {str(e)}{self._aviso_salvos()}", self._exibindo_salvos)
+        except Exception as e:
+            self._update_ui(f"❌ Erro inesperado: {str(e)}{self._aviso_salvos()}", self._exibindo_salvos)
+
+    def _receber_lote(self, pedido: str, itens: list):
+        """Acrescenta os itens que acabaram de chegar do download em andamento"""
         try:
-            self.lista_resultados.controls.clear()
+            if pedido != self._pedido_atual:
+                return
+            if self._pedido_grid != pedido:
+                self._exibir_resultados([])
+            novos = [item for item in itens if isinstance(item, dict)]
+            self._itens_todos.extend(novos)
+            self._indice = None  # Os índices são refeitos com os itens novos
+            if self._itens is self._itens_todos:
+                # Sem filtro nem ordenação: os novos itens só vão para o fim
+                self._chaves_itens.extend(self._chavear(novos, self._ocorrencias))
+                if len(self._grid.controls) < AppConfig.CARDS_POR_PAGINA:
+                    self._carregar_mais_cards()
+                else:
+                    self.botao_mais.visible = True
+            elif not self._refiltro_agendado:
+                # Com filtro, os índices são refeitos no máximo uma vez por intervalo
+                self._refiltro_agendado = True
+                self.page.run_task(self._refiltrar_recebidos, pedido)
+            self._update_ui(f"⏬ {len(self._itens_todos)} itens recebidos...", True)
+        except Exception as e:
+            logger.error(f"Erro ao exibir lote recebido: {str(e)}")
+
+    async def _refiltrar_recebidos(self, pedido: str):
+        """Aplica o filtro ativo aos itens que chegaram do download em andamento"""
+        try:
+            await asyncio.sleep(AppConfig.INTERVALO_FILTRO_STREAMING)
+            self._refiltro_agendado = False
+            if pedido != self._pedido_atual or self._grid is None:
+                return
+            itens = self._itens_filtrados()
+            self._reconciliar_cards(itens)
+            self._update_ui(
+                f"⏬ {len(self._itens_todos)} itens recebidos ({len(itens)} no filtro)...",
+                True
+            )
+        except Exception as e:
+            self._refiltro_agendado = False
+            logger.error(f"Erro ao filtrar itens recebidos: {str(e)}")
+
+    def _aviso_salvos(self) -> str:
+        return " (exibindo dados salvos)" if self._exibindo_salvos else ""
+
+    def _acompanhar_pedido(self, pedido: str):
+        """Inscreve a sessão no tópico do pedido para receber resultados de outras sessões"""
+        if not AppConfig.PUBSUB_PEDIDOS:
+            return
+        topico = f"sugestao-rolos/{pedido}"
+        if topico == self._topico:
+            return
+        if self._topico:
+            self.page.pubsub.unsubscribe_topic(self._topico)
+        self.page.pubsub.subscribe_topic(topico, self._ao_receber_pedido)
+        self._topico = topico
+
+    def _publicar_pedido(self, topico: str, dados: list):
+        """Repassa dados novos do pedido às demais sessões inscritas"""
+        self.page.pubsub.send_others_on_topic(topico, dados)
+
+    async def _ao_receber_pedido(self, topico: str, dados: list):
+        """Atualiza os cards com o resultado publicado por outra sessão"""
+        try:
+            if topico != self._topico or dados is self._dados_exibidos:
+                return
+            # Uma busca em andamento receberá o mesmo resultado pelo single-flight
+            if self._tarefa_busca and not self._tarefa_busca.done():
+                return
+            self._exibir_resultados(dados or [])
+        except Exception as e:
+            logger.error(f"Erro ao receber pedido publicado: {str(e)}")
+
+    def _exibir_resultados(self, dados: list, salvo_em: Optional[float] = None):
+        """Exibe os resultados na UI; salvo_em marca dados locais ainda não revalidados"""
+        try:
+            self._dados_exibidos = dados
+            self._exibindo_salvos = salvo_em is not None
+            self._salvo_em = salvo_em
+            self._itens_todos = [item for item in dados if isinstance(item, dict)]
+            self._indice = None
+            itens = self._itens_filtrados()
+            runs_count = GerenciadorLayout.colunas(self.page)
+
+            if self._grid is not None and self._pedido_grid == self._pedido_atual:
+                # Mesmo pedido: reaproveita grid e cards, mexendo só no que mudou
+                if isinstance(self._grid, ft.GridView):
+                    self._grid.runs_count = runs_count
+                self._reconciliar_cards(itens)
+            else:
+                self._montar_grid(itens, runs_count)
+                self._pedido_grid = self._pedido_atual
+
+            filtrados = f" ({len(itens)} no filtro)" if len(itens) != len(self._itens_todos) else ""
+            if self._exibindo_salvos:
+                hora = time.strftime("%d/%m %H:%M", time.localtime(salvo_em))
+                self._update_ui(f"🕓 {len(dados)} itens salvos em {hora}{filtrados} (desatualizado, atualizando...)", True)
+            else:
+                self._update_ui(f"✅ {len(dados)} itens encontrados{filtrados}", True)
             
-            grid = ft.GridView(
+        except Exception as e:
+            self._update_ui(f"❌ Erro ao exibir resultados: {str(e)}", False)
+
+    def _itens_filtrados(self) -> List[Dict]:
+        """Aplica o filtro e a ordenação da barra sobre os itens já carregados"""
+        prefixo = (self.filtro_input.value or "").strip()
+        _, ordenar_por, decrescente = ORDENACOES.get(self.ordenar_dropdown.value, ORDENACOES["original"])
+        if not prefixo and not ordenar_por:
+            return self._itens_todos
+        if self._indice is None:
+            self._indice = IndiceResultados(self._itens_todos)
+        return self._indice.filtrar(self.campo_filtro.value, prefixo, ordenar_por, decrescente)
+
+    async def _on_filtrar(self, e: ft.ControlEvent):
+        """Refaz a lista exibida a partir dos índices, sem consultar a API"""
+        try:
+            if self._grid is None or self._dados_exibidos is None:
+                return
+            inicio = time.perf_counter()
+            itens = self._itens_filtrados()
+            self._reconciliar_cards(itens)
+            duracao = (time.perf_counter() - inicio) * 1000
+            self._update_ui(
+                f"🔎 {len(itens)} de {len(self._itens_todos)} itens ({duracao:.0f} ms)",
+                True
+            )
+        except Exception as e:
+            logger.error(f"Erro ao filtrar resultados: {str(e)}")
+
+    @staticmethod
+    def _chavear(itens: List[Dict], ocorrencias: Optional[Dict[tuple, int]] = None) -> List[tuple]:
+        """Chave de cada item; itens repetidos recebem o número da ocorrência"""
+        ocorrencias = {} if ocorrencias is None else ocorrencias
+        chaves = []
+        for item in itens:
+            chave = ResponsiveCard.chave(item)
+            n = ocorrencias.get(chave, 0)
+            ocorrencias[chave] = n + 1
+            chaves.append(chave + (n,))
+        return chaves
+
+    def _montar_grid(self, itens: List[Dict], runs_count: int):
+        """Cria um grid novo (ou lista, no modo compacto) com a primeira página de itens"""
+        self.lista_resultados.controls.clear()
+        if self._linhas_lote:
+            # O lote segue na lista, oculto, e continua recebendo o status dos pedidos
+            self.painel_lote.visible = False
+            self.botao_voltar_lote.text = f"⬅ Voltar ao lote ({self._resumo_lote})"
+            self.botao_voltar_lote.visible = True
+            self.lista_resultados.controls.extend([self.painel_lote, self.botao_voltar_lote])
+        if self.modo_compacto.value:
+            self._grid = ft.ListView(
+                expand=True,
+                spacing=2,
+                padding=5,
+                on_scroll=self._on_rolar_grid,
+                on_scroll_interval=100,
+            )
+        else:
+            self._grid = ft.GridView(
                 expand=True,
-                runs_count=1 if self.page.window.width < AppConfig.MOBILE_BREAKPOINT else 3,  # Ajusta colunas em telas pequenas
+                runs_count=runs_count,  # Ajusta colunas em telas pequenas
                 max_extent=300,
                 child_aspect_ratio=0.8,
                 spacing=20,  # Espaço horizontal
                 run_spacing=20,  # Espaço vertical
-                padding=10
+                padding=10,
+                on_scroll=self._on_rolar_grid,
+                on_scroll_interval=100,
             )
 
-            for item in dados:
-                if isinstance(item, dict):
-                    grid.controls.append(ResponsiveCard(item, self.page))
+        # Cards são criados sob demanda, uma página por vez
+        self._itens = itens
+        self._ocorrencias = {}
+        self._chaves_itens = self._chavear(itens, self._ocorrencias)
+        self._cards = {}
+        self._carregar_mais_cards()
+        self.lista_resultados.controls.extend([self._grid, self.botao_mais])
 
-            self.lista_resultados.controls.append(grid)
-            self._update_ui(f"✅ {len(dados)} itens encontrados", True)
-            
+    def _reconciliar_cards(self, itens: List[Dict]):
+        """Atualiza os cards existentes por chave, criando ou removendo só os que mudaram"""
+        self._ocorrencias = {}
+        chaves = self._chavear(itens, self._ocorrencias)
+        qtd = min(len(itens), max(len(self._grid.controls), AppConfig.CARDS_POR_PAGINA))
+        cards: Dict[tuple, ResponsiveCard] = {}
+        for item, chave in zip(itens[:qtd], chaves[:qtd]):
+            card = self._cards.get(chave)
+            if card is None:
+                card = self._classe_item()(item, self.page)
+            else:
+                card.atualizar(item)
+            cards[chave] = card
+        self._grid.controls = list(cards.values())
+        # Cards que saíram da lista (ex.: por um filtro) ficam guardados para voltar sem recriar
+        for chave, card in self._cards.items():
+            if len(cards) >= AppConfig.CARDS_RETIDOS:
+                break
+            cards.setdefault(chave, card)
+        self._itens, self._chaves_itens, self._cards = itens, chaves, cards
+        self.botao_mais.visible = qtd < len(itens)
+
+    def _classe_item(self) -> type:
+        return LinhaCompacta if self.modo_compacto.value else ResponsiveCard
+
+    async def _on_modo_compacto(self, e: ft.ControlEvent):
+        """Redesenha os resultados exibidos no modo escolhido"""
+        try:
+            if self._dados_exibidos is not None:
+                self._pedido_grid = None  # Força um grid novo
+                self._exibir_resultados(self._dados_exibidos, salvo_em=self._salvo_em)
         except Exception as e:
-            self._update_ui(f"❌ Erro ao exibir resultados: {str(e)}", False)
+            logger.error(f"Erro ao trocar modo de exibição: {str(e)}")
+
+    def _carregar_mais_cards(self) -> bool:
+        """Acrescenta a próxima página de cards ao grid; retorna se havia mais itens"""
+        inicio = len(self._grid.controls)
+        fim = inicio + AppConfig.CARDS_POR_PAGINA
+        pagina = self._itens[inicio:fim]
+        for item, chave in zip(pagina, self._chaves_itens[inicio:fim]):
+            card = self._classe_item()(item, self.page)
+            self._cards[chave] = card
+            self._grid.controls.append(card)
+        self.botao_mais.visible = len(self._grid.controls) < len(self._itens)
+        return bool(pagina)
+
+    async def _on_rolar_grid(self, e: ft.OnScrollEvent):
+        """Carrega mais cards quando a rolagem se aproxima do fim do grid"""
+        try:
+            if e.control is not self._grid or e.max_scroll_extent is None:
+                return
+            if e.pixels >= e.max_scroll_extent - AppConfig.CARDS_MARGEM_ROLAGEM:
+                if self._carregar_mais_cards():
+                    self._atualizacoes.marcar(self.lista_resultados)
+        except Exception as e:
+            logger.error(f"Erro ao carregar mais cards: {str(e)}")
+
+    async def _on_mostrar_mais(self, e: ft.ControlEvent):
+        """Carrega mais cards quando a tela não rola (poucos itens visíveis)"""
+        try:
+            if self._grid is not None and self._carregar_mais_cards():
+                self._atualizacoes.marcar(self.lista_resultados)
+        except Exception as e:
+            logger.error(f"Erro ao carregar mais cards: {str(e)}")
 
     def _update_ui(self, mensagem: str, mostrar_resultados: bool):
         """Atualiza a UI de forma consistente"""
         self.resultado_info.value = mensagem
         self.painel_resultado.visible = mostrar_resultados
-        self.page.update()
+        # Tudo o que os resultados alteram fica dentro do painel
+        self._atualizacoes.marcar(self.resultado_info, self.painel_resultado)
 
     def _abrir_pdf(self, e: ft.ControlEvent):
         """Abre PDF do pedido"""
@@ -241,16 +1286,33 @@ class SugestaoRolosView:
                         ft.ElevatedButton("🔍 Buscar", on_click=self.buscar_handler),
                         ft.ElevatedButton("📄 Gerar PDF", on_click=self.pdf_handler),
                         ft.ElevatedButton("⬅ Voltar", on_click=lambda _: self.page.go("/")),
+                        self.modo_compacto,
                     ],
-                    spacing=10
+                    spacing=10,
+                    wrap=True
+                ),
+                self.lote_input,
+                ft.Row(
+                    controls=[
+                        ft.ElevatedButton("📋 Buscar lote", on_click=self.lote_handler),
+                        ft.ElevatedButton(
+                            "📂 Carregar arquivo",
+                            on_click=lambda _: self.seletor_lote.pick_files(
+                                allowed_extensions=["txt", "csv"]
+                            )
+                        ),
+                    ],
+                    spacing=10,
+                    wrap=True
                 ),
                 self.resultado_info,
+                ft.Row(
+                    controls=[self.campo_filtro, self.filtro_input, self.ordenar_dropdown],
+                    spacing=10,
+                    wrap=True
+                ),
                 ft.Divider(),
-                ft.Container(
-                    content=self.painel_resultado,
-                    expand=True,
-                    height=self.page.window.height * 0.7 if self.page.window.height else 500
-                )
+                self.container_resultado,
             ],
             spacing=12,
             expand=True,
@@ -284,22 +1346,35 @@ def main(page: ft.Page) -> None:
         # Log da plataforma para depuração
         logger.info(f"Plataforma em execução: {page.platform}")
 
+        sugestao_atual: Optional[SugestaoRolosView] = None
+
+        def encerrar_views(e=None) -> None:
+            nonlocal sugestao_atual
+            if sugestao_atual is not None:
+                sugestao_atual.encerrar()
+                sugestao_atual = None
+
         def route_change(e: ft.RouteChangeEvent) -> None:
             """Gerencia navegação entre views"""
+            nonlocal sugestao_atual
             try:
+                encerrar_views()
+                page.pubsub.unsubscribe_all()
+                page.overlay.clear()
                 page.views.clear()
                 
                 if e.route == "/":
                     page.views.append(ft.View("/", [home_view(page)]))
                 elif e.route == "/sugestao":
-                    view = SugestaoRolosView(page)
-                    page.views.append(ft.View("/sugestao", [view.get_view()]))
+                    sugestao_atual = SugestaoRolosView(page)
+                    page.views.append(ft.View("/sugestao", [sugestao_atual.get_view()]))
                     
                 page.update()
             except Exception as ex:
                 logger.error(f"Erro na navegação: {str(ex)}")
 
         page.on_route_change = route_change
+        page.on_disconnect = encerrar_views
         page.go(page.route or "/")
         
     except Exception as ex:
@@ -344,7 +1419,8 @@ if __name__ == "__main__":
             view=ft.WEB_BROWSER,  # Configurado para modo web
             host=AppConfig.SERVER_HOST,
             port=AppConfig.SERVER_PORT,
-            assets_dir=AppConfig.ASSETS_DIR
+            assets_dir=AppConfig.ASSETS_DIR,
+            upload_dir=AppConfig.UPLOAD_DIR
         )
     except Exception as ex:
         logger.critical(f"Erro ao iniciar ft.app: {str(ex)}")